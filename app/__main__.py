@@ -7,7 +7,9 @@ import time
 import webbrowser
 
 import uvicorn
+from uvicorn.main import STARTUP_FAILURE
 
+from app.events import event_hub
 from app.settings import APP_HOST, APP_PORT
 
 # paho-mqtt (used by aiomqtt) requires add_reader/add_writer which
@@ -18,6 +20,18 @@ if sys.platform == "win32":
 _URL = f"http://127.0.0.1:{APP_PORT}"
 
 
+class _Server(uvicorn.Server):
+    """Ends the /api/events streams as soon as an exit signal arrives.
+
+    uvicorn waits for open connections before running lifespan shutdown,
+    and an event stream never closes on its own.
+    """
+
+    def handle_exit(self, sig, frame) -> None:
+        event_hub.close()
+        super().handle_exit(sig, frame)
+
+
 def _open_browser() -> None:
     """Wait for the server to accept connections, then open the default browser."""
     import socket
@@ -34,7 +48,15 @@ def _open_browser() -> None:
 
 def main() -> None:
     threading.Thread(target=_open_browser, daemon=True).start()
-    uvicorn.run("app.main:app", host=APP_HOST, port=APP_PORT, reload=False)
+    config = uvicorn.Config("app.main:app", host=APP_HOST, port=APP_PORT, reload=False)
+    server = _Server(config)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        # uvicorn re-raises the captured Ctrl+C after a clean shutdown.
+        pass
+    if not server.started:
+        sys.exit(STARTUP_FAILURE)
 
 
 if __name__ == "__main__":
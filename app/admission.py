@@ -0,0 +1,119 @@
+"""Admission control for new jobs.
+
+A job is refused when, counting it, its printer would have more than
+``ADMISSION_PRINTER_MAX_QUEUED`` jobs waiting, an estimated backlog above
+``ADMISSION_MAX_BACKLOG_S`` seconds, or all printers together more than
+``ADMISSION_GLOBAL_MAX_QUEUED`` jobs. The backlog estimate is the number of
+waiting jobs (including the one printing) times the printer's observed job
+duration, an exponential moving average over finished attempts.
+
+Depths come from the job queue's in-memory lanes, so checking costs no
+database query. Concurrent submissions are checked before their jobs
+reach the lanes, so a burst can overshoot a limit by the number of
+requests in flight.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Callable, Dict, List, Optional
+
+from app.metrics import ADMISSION_REJECTED
+from app.settings import (
+    ADMISSION_DEFAULT_JOB_S,
+    ADMISSION_GLOBAL_MAX_QUEUED,
+    ADMISSION_MAX_BACKLOG_S,
+    ADMISSION_PRINTER_MAX_QUEUED,
+)
+
+# Weight of the newest duration in the moving average.
+_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(RuntimeError):
+    def __init__(self, reason: str, printer_id: Optional[int], retry_after_s: int, message: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+        self.printer_id = printer_id
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        depths: Callable[[], Dict[int, int]],
+        printer_max: int = ADMISSION_PRINTER_MAX_QUEUED,
+        global_max: int = ADMISSION_GLOBAL_MAX_QUEUED,
+        max_backlog_s: float = ADMISSION_MAX_BACKLOG_S,
+        default_job_s: float = ADMISSION_DEFAULT_JOB_S,
+    ) -> None:
+        self._depths = depths
+        self.printer_max = max(0, printer_max)
+        self.global_max = max(0, global_max)
+        self.max_backlog_s = max(0.0, max_backlog_s)
+        self.default_job_s = max(0.1, default_job_s)
+        self._job_s: Dict[int, float] = {}
+
+    def record_duration(self, printer_id: int, seconds: float) -> None:
+        previous = self._job_s.get(printer_id)
+        if previous is None:
+            self._job_s[printer_id] = seconds
+        else:
+            self._job_s[printer_id] = previous + _EWMA_ALPHA * (seconds - previous)
+
+    def job_seconds(self, printer_id: int) -> float:
+        return self._job_s.get(printer_id, self.default_job_s)
+
+    def check(self, counts: Dict[int, int]) -> None:
+        """Raise ``AdmissionRejected`` unless ``counts`` (printer -> new jobs) fit."""
+        depths = self._depths()
+        for printer_id, count in counts.items():
+            depth = depths.get(printer_id, 0) + count
+            job_s = self.job_seconds(printer_id)
+            if self.printer_max and depth > self.printer_max:
+                self._reject(
+                    "printer_queue", printer_id, (depth - self.printer_max) * job_s,
+                    f"Printer {printer_id} queue is full ({self.printer_max} jobs)",
+                )
+            backlog_s = depth * job_s
+            if self.max_backlog_s and backlog_s > self.max_backlog_s:
+                self._reject(
+                    "printer_backlog", printer_id, backlog_s - self.max_backlog_s,
+                    f"Printer {printer_id} backlog is {backlog_s:.0f}s (limit {self.max_backlog_s:.0f}s)",
+                )
+        total = sum(depths.values()) + sum(counts.values())
+        if self.global_max and total > self.global_max:
+            # The lanes drain in parallel.
+            busy = [printer_id for printer_id, depth in depths.items() if depth] or list(counts)
+            job_s = sum(self.job_seconds(printer_id) for printer_id in busy) / len(busy)
+            self._reject(
+                "global_queue", None, (total - self.global_max) * job_s / len(busy),
+                f"Gateway queue is full ({self.global_max} jobs)",
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        depths = self._depths()
+        printers: List[Dict[str, Any]] = []
+        for printer_id in sorted(set(depths) | set(self._job_s)):
+            depth = depths.get(printer_id, 0)
+            job_s = self.job_seconds(printer_id)
+            printers.append({
+                "printer_id": printer_id,
+                "queued": depth,
+                "avg_job_s": round(job_s, 3),
+                "backlog_s": round(depth * job_s, 1),
+            })
+        return {
+            "limits": {
+                "printer_max_queued": self.printer_max,
+                "global_max_queued": self.global_max,
+                "max_backlog_s": self.max_backlog_s,
+                "default_job_s": self.default_job_s,
+            },
+            "queued": sum(depths.values()),
+            "printers": printers,
+        }
+
+    @staticmethod
+    def _reject(reason: str, printer_id: Optional[int], retry_after_s: float, message: str) -> None:
+        ADMISSION_REJECTED.labels(printer_id if printer_id is not None else "", reason).inc()
+        raise AdmissionRejected(reason, printer_id, max(1, math.ceil(retry_after_s)), message)
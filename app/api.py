@@ -1,28 +1,41 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime
-from typing import Any, Dict, List
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
 
-from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.adapters import get_adapter, list_supported_models
+from app.admission import AdmissionRejected
 from app.adapters.datecs_base import DatecsBaseAdapter
 from app.db import (
     create_job,
+    create_jobs,
     create_printer,
     delete_printer,
+    find_job_by_idempotency_key,
     get_job,
     get_printer,
     list_jobs,
     list_logs,
     list_printers,
+    mark_failed,
+    mark_success,
     now_iso,
     update_job,
     update_printer,
 )
-from app.app_logging import log_error, log_info
+from app.app_logging import log_error, log_info, log_warning, log_writer
+from app.device_io import device_executors, device_queries
+from app.events import EVENT_KINDS, Subscriber, event_hub
+from app.log_sinks import LEVEL_ORDER
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
 from app.models import (
+    JobBatchCreate,
+    JobBatchOut,
     JobCreate,
     JobOut,
     LogOut,
@@ -32,9 +45,12 @@ from app.models import (
 )
 from app.datecs_fiscal import _cancel_receipt
 from app.detect import detect_printer_on_lan, detect_printer_on_port
+from app.job_bus import is_final
+from app.job_queue import default_priority, normalize_deadline
 from app.printer_service import send_payload
-from app.settings import JOB_TIMEOUT_SECONDS
+from app.settings import EVENTS_KEEPALIVE_S, JOB_TIMEOUT_SECONDS, JOB_WAIT_MAX_S
 from app.state import job_queue
+from app.trace import TRACE_LEVELS, flight_recorder, printer_trace_level, trace_scope
 from app.transports.serial_transport import list_serial_ports
 
 router = APIRouter()
@@ -56,6 +72,17 @@ def _validate_model(model: str | None) -> None:
         )
 
 
+def _validate_trace_level(config: Dict[str, Any] | None) -> None:
+    level = (config or {}).get("trace_level")
+    if level is None:
+        return
+    if str(level).lower() not in TRACE_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"trace_level must be one of: {', '.join(TRACE_LEVELS)}",
+        )
+
+
 def _validate_transport(transport: str | None) -> None:
     if transport is None:
         return
@@ -86,26 +113,35 @@ def printer_create(printer: PrinterCreate) -> Dict[str, Any]:
     payload = _model_dump(printer)
     _validate_model(payload.get("model"))
     _validate_transport(payload.get("transport"))
-    return create_printer(payload)
+    _validate_trace_level(payload.get("config"))
+    created = create_printer(payload)
+    event_hub.publish("printer", {"action": "created", "printer": created})
+    return created
 
 
 @router.put("/printers/{printer_id}", response_model=PrinterOut)
-def printer_update(printer_id: int, printer: PrinterUpdate) -> Dict[str, Any]:
+async def printer_update(printer_id: int, printer: PrinterUpdate) -> Dict[str, Any]:
     payload = _model_dump(printer)
     _validate_model(payload.get("model"))
     _validate_transport(payload.get("transport"))
-    updated = update_printer(printer_id, payload)
+    _validate_trace_level(payload.get("config"))
+    updated = await asyncio.to_thread(update_printer, printer_id, payload)
     if not updated:
         raise HTTPException(status_code=404, detail="Printer not found")
+    device_queries.invalidate(printer_id)
+    event_hub.publish("printer", {"action": "updated", "printer": updated})
     return updated
 
 
 @router.delete("/printers/{printer_id}")
-def printer_delete(printer_id: int) -> Dict[str, str]:
+async def printer_delete(printer_id: int) -> Dict[str, str]:
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
-    delete_printer(printer_id)
+    await asyncio.to_thread(delete_printer, printer_id)
+    device_executors.discard(printer_id)
+    device_queries.invalidate(printer_id)
+    event_hub.publish("printer", {"action": "deleted", "printer": printer})
     return {"status": "deleted"}
 
 
@@ -115,20 +151,8 @@ async def printer_refresh_info(printer_id: int) -> Dict[str, Any]:
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
-    transport_type = (printer.get("transport") or "serial").lower()
     try:
-        if transport_type == "lan":
-            result = await asyncio.to_thread(
-                detect_printer_on_lan,
-                printer.get("ip_address", ""),
-                printer.get("tcp_port", 4999),
-            )
-        else:
-            result = await asyncio.to_thread(
-                detect_printer_on_port,
-                printer.get("port", ""),
-                printer.get("baudrate"),
-            )
+        result = await device_queries.get(printer_id, "refresh-info", lambda: _detect_printer(printer))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
     if not result.get("detected"):
@@ -141,10 +165,80 @@ async def printer_refresh_info(printer_id: int) -> Dict[str, Any]:
     if result.get("fiscal_memory_number"):
         update_data["fiscal_memory_number"] = result["fiscal_memory_number"]
     if update_data:
-        updated = update_printer(printer_id, update_data)
+        updated = await asyncio.to_thread(update_printer, printer_id, update_data)
         log_info("PRINTER_INFO_REFRESHED", {"printer_id": printer_id, **update_data})
+        event_hub.publish("printer", {"action": "updated", "printer": updated})
         return updated
-    return get_printer(printer_id)
+    return await asyncio.to_thread(get_printer, printer_id)
+
+
+@router.get("/admission")
+async def admission_state() -> Dict[str, Any]:
+    """Admission limits and current usage per printer (read on the loop, which owns the lanes)."""
+    return job_queue.admission.snapshot()
+
+
+async def _detect_printer(printer: Dict[str, Any]) -> Dict[str, Any]:
+    with trace_scope(printer):
+        if (printer.get("transport") or "serial").lower() == "lan":
+            return await device_executors.run(
+                printer["id"],
+                detect_printer_on_lan,
+                printer.get("ip_address", ""),
+                printer.get("tcp_port", 4999),
+            )
+        return await device_executors.run(
+            printer["id"],
+            detect_printer_on_port,
+            printer.get("port", ""),
+            printer.get("baudrate"),
+        )
+
+
+@router.get("/breakers")
+def breakers_list() -> List[Dict[str, Any]]:
+    """Circuit breaker state of every printer lane."""
+    return job_queue.breakers()
+
+
+@router.get("/printers/{printer_id}/breaker")
+def printer_breaker(printer_id: int) -> Dict[str, Any]:
+    breaker = job_queue.get_breaker(printer_id)
+    if breaker is None:
+        raise HTTPException(status_code=404, detail="No job lane for this printer")
+    return breaker.snapshot()
+
+
+@router.post("/printers/{printer_id}/breaker/probe")
+async def printer_breaker_probe(printer_id: int) -> Dict[str, Any]:
+    """Probe an open breaker immediately instead of waiting for the backoff."""
+    snapshot = job_queue.probe_breaker(printer_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No job lane for this printer")
+    return snapshot
+
+
+@router.get("/printers/{printer_id}/trace")
+def printer_trace(printer_id: int) -> Dict[str, Any]:
+    """Return the in-memory protocol flight recorder for a printer (not persisted)."""
+    printer = get_printer(printer_id)
+    if not printer:
+        raise HTTPException(status_code=404, detail="Printer not found")
+    return {
+        "printer_id": printer_id,
+        "trace_level": printer_trace_level(printer),
+        "entries": flight_recorder.snapshot(printer_id),
+    }
+
+
+@router.post("/printers/{printer_id}/trace/dump")
+def printer_trace_dump(printer_id: int) -> Dict[str, Any]:
+    """Persist the printer's flight recorder to the log store and clear it."""
+    printer = get_printer(printer_id)
+    if not printer:
+        raise HTTPException(status_code=404, detail="Printer not found")
+    written = flight_recorder.dump(printer_id, reason="requested")
+    return {"printer_id": printer_id, "entries": written}
 
 
 @router.post("/printers/{printer_id}/test-print")
@@ -157,9 +251,8 @@ async def printer_test_print(printer_id: int) -> Dict[str, str]:
     lock = job_queue.get_lock(printer_id)
     async with lock:
         try:
-            await asyncio.wait_for(
-                asyncio.to_thread(send_payload, printer, "test", {}),
-                timeout=JOB_TIMEOUT_SECONDS,
+            await device_executors.run_cancellable(
+                printer_id, JOB_TIMEOUT_SECONDS, send_payload, printer, "test", {}
             )
         except Exception as exc:  # noqa: BLE001
             log_error("TEST_PRINT_FAILED", {"printer_id": printer_id, "error": str(exc)})
@@ -168,20 +261,167 @@ async def printer_test_print(printer_id: int) -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@router.post("/jobs", response_model=JobOut)
-def job_create(job: JobCreate) -> Dict[str, Any]:
+def _job_create_args(job: JobCreate, check_printer: bool = True) -> Dict[str, Any]:
+    """Validate the printer and resolve defaults for one JobCreate.
+
+    ``check_printer=False`` for a replay of an accepted idempotency key: the
+    job exists already, even if its printer was disabled since.
+    """
     payload = _model_dump(job)
-    printer = get_printer(payload["printer_id"])
-    if not printer:
-        raise HTTPException(status_code=404, detail="Printer not found")
-    if not printer.get("enabled"):
-        raise HTTPException(status_code=400, detail="Printer is disabled")
-    return create_job(payload["printer_id"], payload["payload_type"], payload["payload"])
+    if check_printer:
+        printer = get_printer(payload["printer_id"])
+        if not printer:
+            raise HTTPException(status_code=404, detail="Printer not found")
+        if not printer.get("enabled"):
+            raise HTTPException(status_code=400, detail="Printer is disabled")
+    priority = payload.get("priority")
+    return {
+        "printer_id": payload["printer_id"],
+        "payload_type": payload["payload_type"],
+        "payload": payload["payload"],
+        "priority": default_priority(payload["payload_type"]) if priority is None else priority,
+        "deadline": normalize_deadline(payload.get("deadline")),
+        "idempotency_key": payload.get("idempotency_key"),
+    }
+
+
+def _admission_error(exc: AdmissionRejected, count: int = 1) -> HTTPException:
+    log_warning("JOB_ADMISSION_REJECTED", {
+        "printer_id": exc.printer_id,
+        "reason": exc.reason,
+        "count": count,
+        "retry_after_s": exc.retry_after_s,
+    })
+    return HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after_s)})
+
+
+@router.post(
+    "/jobs",
+    response_model=JobOut,
+    responses={
+        202: {"model": JobOut, "description": "Still queued / printing when `wait` expired"},
+        429: {"description": "Queue or backlog limit reached; see Retry-After"},
+    },
+)
+async def job_create(
+    job: JobCreate,
+    response: Response,
+    wait: float | None = Query(
+        None, ge=0, description=f"Hold the response until the job finishes (seconds, capped at {JOB_WAIT_MAX_S:g})"
+    ),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=200),
+) -> Any:
+    key = job.idempotency_key or idempotency_key
+    # A repeat of an already accepted request gets its job back before any
+    # check that could now fail (printer disabled, admission limits).
+    existing = await asyncio.to_thread(find_job_by_idempotency_key, key) if key else None
+    if existing is not None:
+        created = {**existing, "idempotent_replay": True}
+    else:
+        args = await asyncio.to_thread(_job_create_args, job)
+        args["idempotency_key"] = key
+        try:
+            job_queue.admission.check({args["printer_id"]: 1})
+        except AdmissionRejected as exc:
+            raise _admission_error(exc) from exc
+        created = await asyncio.to_thread(create_job, **args)
+    if created.pop("idempotent_replay", False):
+        response.headers["Idempotent-Replayed"] = "true"
+    if not wait:
+        return created
+    # Print-and-wait: answer with the finished job (result.receipt_number
+    # for fiscal receipts) or 202 with its current state.
+    current = await job_queue.completions.wait(created["id"], min(wait, JOB_WAIT_MAX_S)) or created
+    if is_final(current):
+        return current
+    accepted = JSONResponse(
+        JobOut.model_validate(current).model_dump(),
+        status_code=202,
+        headers={"Location": f"/api/jobs/{current['id']}"},
+    )
+    if "Idempotent-Replayed" in response.headers:
+        accepted.headers["Idempotent-Replayed"] = "true"
+    return accepted
+
+
+@router.post("/jobs/batch", response_model=JobBatchOut)
+async def jobs_batch_create(batch: JobBatchCreate) -> Dict[str, Any]:
+    """Validate every job first, then insert them all in one transaction."""
+    # Items whose key was already accepted replay their job and are not new.
+    keys = {job.idempotency_key for job in batch.jobs if job.idempotency_key}
+    accepted = await asyncio.to_thread(_accepted_idempotency_keys, keys)
+    items, errors = await asyncio.to_thread(_batch_create_args, batch.jobs, accepted)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    counts: Dict[int, int] = {}
+    for item in items:
+        key = item["idempotency_key"]
+        if key in accepted:
+            continue
+        if key:
+            accepted.add(key)
+        counts[item["printer_id"]] = counts.get(item["printer_id"], 0) + 1
+    if counts:
+        try:
+            job_queue.admission.check(counts)
+        except AdmissionRejected as exc:
+            raise _admission_error(exc, sum(counts.values())) from exc
+    jobs = await asyncio.to_thread(create_jobs, items, ordered=batch.ordered)
+    log_info("JOB_BATCH_CREATED", {"count": len(jobs), "ordered": batch.ordered})
+    return {"job_ids": [job["id"] for job in jobs], "jobs": jobs}
+
+
+def _batch_create_args(
+    jobs: List[JobCreate], accepted: set[str]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    items: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    for index, job in enumerate(jobs):
+        try:
+            items.append(_job_create_args(job, check_printer=job.idempotency_key not in accepted))
+        except HTTPException as exc:
+            errors.append({"index": index, "printer_id": job.printer_id, "error": exc.detail})
+    return items, errors
+
+
+def _accepted_idempotency_keys(keys: Iterable[str]) -> set[str]:
+    return {key for key in keys if find_job_by_idempotency_key(key) is not None}
+
+
+def _parse_fields(fields: str | None, model: Any) -> List[str] | None:
+    if not fields:
+        return None
+    requested = [value.strip() for value in fields.split(",") if value.strip()]
+    unknown = sorted(set(requested) - set(model.model_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _parse_since(since: str | None) -> str | None:
+    """UTC ISO string for a ``since`` filter (naive = UTC), as created_at is stored."""
+    if not since:
+        return None
+    try:
+        value = datetime.fromisoformat(since.strip().replace("Z", "+00:00"))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid since: {since}") from exc
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
 
 
 @router.get("/jobs", response_model=List[JobOut])
-def jobs_list(limit: int = Query(50, ge=1, le=200)) -> List[Dict[str, Any]]:
-    return list_jobs(limit)
+def jobs_list(
+    limit: int = Query(50, ge=1, le=200),
+    before_id: int | None = Query(None, description="Return jobs older than this id"),
+    after_id: int | None = Query(None, description="Return jobs newer than this id"),
+    fields: str | None = Query(None, description="Comma-separated fields, e.g. id,status,created_at"),
+) -> Any:
+    field_list = _parse_fields(fields, JobOut)
+    jobs = list_jobs(limit, before_id=before_id, after_id=after_id, fields=field_list)
+    # A projection is not a full JobOut; return it as-is.
+    return JSONResponse(jobs) if field_list else jobs
 
 
 @router.get("/jobs/{job_id}", response_model=JobOut)
@@ -197,9 +437,15 @@ def job_retry(job_id: int) -> Dict[str, Any]:
     job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    if job["status"] not in {"failed", "queued"}:
-        raise HTTPException(status_code=400, detail="Only failed or queued jobs can be retried")
-    updated = update_job(job_id, {"status": "queued", "error": None, "started_at": None, "finished_at": None})
+    if job.get("archived"):
+        raise HTTPException(status_code=400, detail="Archived jobs cannot be retried")
+    if job["status"] not in {"failed", "queued", "expired"}:
+        raise HTTPException(status_code=400, detail="Only failed, expired or queued jobs can be retried")
+    # A manual retry is an explicit request to print, so drop any deadline.
+    updated = update_job(
+        job_id,
+        {"status": "queued", "error": None, "started_at": None, "finished_at": None, "deadline": None},
+    )
     log_info("JOB_MANUAL_RETRY", {"job_id": job_id, "user_action": True})
     return updated
 
@@ -209,6 +455,8 @@ def job_cancel(job_id: int) -> Dict[str, Any]:
     job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    if job.get("archived"):
+        raise HTTPException(status_code=400, detail="Archived jobs cannot be cancelled")
     if job["status"] == "printing":
         raise HTTPException(status_code=400, detail="Cannot cancel a job that is currently printing")
     updated = update_job(job_id, {"status": "failed", "error": "Cancelled by user", "finished_at": now_iso()})
@@ -217,8 +465,130 @@ def job_cancel(job_id: int) -> Dict[str, Any]:
 
 
 @router.get("/logs", response_model=List[LogOut])
-def logs_list(limit: int = Query(200, ge=1, le=500)) -> List[Dict[str, Any]]:
-    return list_logs(limit)
+def logs_list(
+    limit: int = Query(200, ge=1, le=500),
+    correlation_id: str | None = Query(None),
+    printer_id: int | None = Query(None),
+    job_id: int | None = Query(None),
+    level: str | None = Query(None, description="Comma-separated levels, e.g. error,warning"),
+    since: str | None = Query(None, description="ISO timestamp (inclusive)"),
+    before_id: int | None = Query(None, description="Return logs older than this id"),
+    after_id: int | None = Query(None, description="Return logs newer than this id"),
+    fields: str | None = Query(None, description="Comma-separated fields, e.g. id,level,message"),
+) -> Any:
+    levels = [value.strip().lower() for value in level.split(",") if value.strip()] if level else None
+    field_list = _parse_fields(fields, LogOut)
+    since = _parse_since(since)
+    try:
+        logs = list_logs(
+            limit,
+            correlation_id=correlation_id,
+            printer_id=printer_id,
+            job_id=job_id,
+            levels=levels,
+            since=since,
+            before_id=before_id,
+            after_id=after_id,
+            fields=field_list,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return JSONResponse(logs) if field_list else logs
+
+
+@router.get("/logs/sinks")
+def logs_sinks() -> Dict[str, Any]:
+    """Configured log sinks with their filters and write counters."""
+    return log_writer.stats()
+
+
+@router.get("/events")
+async def events_stream(
+    request: Request,
+    types: str | None = Query(None, description="Comma-separated event types, e.g. job,log"),
+    log_level: str = Query("info", description="Minimum level of log events"),
+    last_event_id: str | None = Query(None, description="Resume after this event id"),
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+) -> StreamingResponse:
+    """Server-sent events: job, log, printer, printer_status and mqtt changes.
+
+    Browsers reconnect with the ``Last-Event-ID`` header on their own; the
+    ``last_event_id`` query parameter is for clients that cannot set it.
+    """
+    kinds = None
+    if types:
+        kinds = {value.strip() for value in types.split(",") if value.strip()}
+        unknown = kinds - set(EVENT_KINDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown event types: {', '.join(sorted(unknown))} (known: {', '.join(EVENT_KINDS)})",
+            )
+    min_level = LEVEL_ORDER.get(log_level.strip().lower())
+    if min_level is None:
+        raise HTTPException(status_code=400, detail=f"Unknown log level: {log_level}")
+    log_levels = {name for name, order in LEVEL_ORDER.items() if order >= min_level}
+    subscriber, replay, resync = event_hub.subscribe(
+        kinds, last_event_id_header or last_event_id, log_levels
+    )
+    return StreamingResponse(
+        _event_stream(request, subscriber, replay, resync),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events/stats")
+def events_stats() -> Dict[str, Any]:
+    return event_hub.stats()
+
+
+def _sse_frame(event_id: str, kind: str, data: Any) -> str:
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _event_stream(
+    request: Request, subscriber: Subscriber, replay: List[Dict[str, Any]], resync: bool
+):
+    last_seq = 0
+    try:
+        if resync:
+            current = event_hub.stats()["last_event_id"]
+            yield _sse_frame(current, "resync", {"last_event_id": current})
+        for event in replay:
+            last_seq = event["seq"]
+            yield _sse_frame(event["id"], event["event"], event["data"])
+        # An overflowed client gets what is already queued, then the stream
+        # ends and the browser reconnects with its Last-Event-ID.
+        while not subscriber.closed and not (subscriber.overflowed and subscriber.queue.empty()):
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=EVENTS_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                if event_hub.closing or await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            # Published while the client subscribed: already sent as replay.
+            if event["seq"] <= last_seq:
+                continue
+            last_seq = event["seq"]
+            yield _sse_frame(event["id"], event["event"], event["data"])
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+
+@router.get("/metrics", response_class=Response)
+async def metrics_text() -> Response:
+    """Prometheus text format; in-process counters only, no database reads."""
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@router.get("/device-io")
+async def device_io_stats() -> Dict[str, Any]:
+    """Per-printer I/O executors and the read-only query cache."""
+    return {**device_executors.stats(), "queries": device_queries.stats()}
 
 
 @router.get("/tools/serial-ports")
@@ -234,7 +604,7 @@ async def detect_printer(body: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
     baudrate = body.get("baudrate")
     try:
         result = await asyncio.wait_for(
-            asyncio.to_thread(detect_printer_on_port, port, baudrate),
+            device_executors.run_tool(detect_printer_on_port, port, baudrate),
             timeout=15,
         )
         return result
@@ -253,7 +623,7 @@ async def detect_printer_lan(body: Dict[str, Any] = Body(...)) -> Dict[str, Any]
     tcp_port = int(body.get("tcp_port", 4999))
     try:
         result = await asyncio.wait_for(
-            asyncio.to_thread(detect_printer_on_lan, ip_address, tcp_port),
+            device_executors.run_tool(detect_printer_on_lan, ip_address, tcp_port),
             timeout=15,
         )
         return result
@@ -265,172 +635,219 @@ async def detect_printer_lan(body: Dict[str, Any] = Body(...)) -> Dict[str, Any]
 
 
 @router.post("/printers/{printer_id}/cancel_receipt")
-def cancel_receipt(printer_id: int) -> Dict[str, Any]:
+async def cancel_receipt(printer_id: int) -> Dict[str, Any]:
+    return await device_executors.run(printer_id, _cancel_receipt_io, printer_id)
+
+
+def _cancel_receipt_io(printer_id: int) -> Dict[str, Any]:
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
     
     job = create_job(printer_id, "cancel_receipt", {"reason": "Manual cancellation by user"})
     
-    try:
-        adapter = get_adapter(printer["model"], printer.get("config") or {})
-        if not isinstance(adapter, DatecsBaseAdapter):
-            update_job(job["id"], {"status": "failed", "error": "Only Datecs printers support cancel receipt", "finished_at": now_iso()})
-            raise HTTPException(status_code=400, detail="Only Datecs printers support cancel receipt")
-        
-        from app.transports.factory import create_transport
+    with trace_scope(printer):
         try:
-            transport = create_transport(printer)
-        except ValueError as exc:
-            update_job(job["id"], {"status": "failed", "error": str(exc), "finished_at": now_iso()})
-            raise HTTPException(status_code=400, detail=str(exc))
-        transport.open()
-        try:
-            from app.datecs_fiscal import _SEQ_BY_PRINTER
-            seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
-            timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
-            seq = _cancel_receipt(transport, adapter, seq, timeout_s, printer_id)
-            _SEQ_BY_PRINTER[printer_id] = seq
-            log_info("MANUAL_CANCEL_RECEIPT", {"printer_id": printer_id, "user_action": True, "job_id": job["id"]})
-            update_job(job["id"], {"status": "success", "finished_at": now_iso()})
-            return {"success": True, "message": "Receipt cancelled", "job_id": job["id"]}
-        finally:
-            transport.close()
-    except HTTPException:
-        raise
-    except Exception as e:
-        log_error("MANUAL_CANCEL_FAILED", {"printer_id": printer_id, "error": str(e), "job_id": job["id"]})
-        update_job(job["id"], {"status": "failed", "error": str(e), "finished_at": now_iso()})
-        raise HTTPException(status_code=500, detail=f"Failed to cancel receipt: {str(e)}")
+            adapter = get_adapter(printer["model"], printer.get("config") or {})
+            if not isinstance(adapter, DatecsBaseAdapter):
+                mark_failed(job["id"], "Only Datecs printers support cancel receipt")
+                raise HTTPException(status_code=400, detail="Only Datecs printers support cancel receipt")
+        
+            from app.transports.factory import create_transport
+            try:
+                transport = create_transport(printer)
+            except ValueError as exc:
+                mark_failed(job["id"], str(exc))
+                raise HTTPException(status_code=400, detail=str(exc))
+            transport.open()
+            try:
+                from app.datecs_fiscal import _SEQ_BY_PRINTER
+                seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
+                timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
+                seq = _cancel_receipt(transport, adapter, seq, timeout_s, printer_id)
+                _SEQ_BY_PRINTER[printer_id] = seq
+                log_info("MANUAL_CANCEL_RECEIPT", {"printer_id": printer_id, "user_action": True, "job_id": job["id"]})
+                mark_success(job["id"])
+                return {"success": True, "message": "Receipt cancelled", "job_id": job["id"]}
+            finally:
+                transport.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            log_error("MANUAL_CANCEL_FAILED", {"printer_id": printer_id, "error": str(e), "job_id": job["id"]})
+            mark_failed(job["id"], str(e))
+            raise HTTPException(status_code=500, detail=f"Failed to cancel receipt: {str(e)}")
 
 
 @router.get("/printers/{printer_id}/status")
-def check_printer_status(printer_id: int) -> Dict[str, Any]:
+async def check_printer_status(printer_id: int, fresh: bool = Query(False, description="Skip the cached result (still shares an in-flight query)")) -> Dict[str, Any]:
+    try:
+        return await device_queries.get(printer_id, "status", lambda: _load_printer_status(printer_id), fresh)
+    except _StatusError as exc:
+        return exc.status
+
+
+class _StatusError(Exception):
+    """An error status: shared with the requests waiting on it, but not cached."""
+
+    def __init__(self, status: Dict[str, Any]) -> None:
+        super().__init__(status.get("message"))
+        self.status = status
+
+
+async def _load_printer_status(printer_id: int) -> Dict[str, Any]:
+    # Published once per device call, not per (cached / coalesced) request.
+    status = await device_executors.run(printer_id, _printer_status_io, printer_id)
+    event_hub.publish("printer_status", {"printer_id": printer_id, "status": status})
+    if status.get("status") == "error":
+        raise _StatusError(status)
+    return status
+
+
+def _printer_status_io(printer_id: int) -> Dict[str, Any]:
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
     
-    try:
-        adapter = get_adapter(printer["model"], printer.get("config") or {})
-        if not isinstance(adapter, DatecsBaseAdapter):
-            return {"status": "unknown", "message": "Status check only for Datecs printers"}
+    with trace_scope(printer):
+        try:
+            adapter = get_adapter(printer["model"], printer.get("config") or {})
+            if not isinstance(adapter, DatecsBaseAdapter):
+                return {"status": "unknown", "message": "Status check only for Datecs printers"}
         
-        from app.transports.factory import create_transport
-        from app.datecs_fiscal import (
-            _diagnostic_status,
-            _SEQ_BY_PRINTER,
-            CMD_STATUS,
-            _send_with_response,
-            _decode_status_flags,
-        )
+            from app.transports.factory import create_transport
+            from app.datecs_fiscal import (
+                _diagnostic_status,
+                _SEQ_BY_PRINTER,
+                CMD_STATUS,
+                _send_with_response,
+                _decode_status_flags,
+            )
         
-        try:
-            transport = create_transport(printer)
-        except ValueError as exc:
-            return {"status": "error", "message": str(exc), "issues": ["config_error"]}
-        transport.open()
-        try:
-            seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
-            timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
+            try:
+                transport = create_transport(printer)
+            except ValueError as exc:
+                return {"status": "error", "message": str(exc), "issues": ["config_error"]}
+            transport.open()
+            try:
+                seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
+                timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
             
-            seq, status_response = _send_with_response(
-                transport, adapter, CMD_STATUS, adapter.data_builder.status_data(), seq, timeout_s, "status", printer_id
-            )
+                seq, status_response = _send_with_response(
+                    transport, adapter, CMD_STATUS, adapter.data_builder.status_data(), seq, timeout_s, "status", printer_id
+                )
             
-            status_flags = _decode_status_flags(status_response.status)
-            issues = []
+                status_flags = _decode_status_flags(status_response.status)
+                issues = []
             
-            if status_flags.get("fiscal_receipt_open") or status_flags.get("service_receipt_open") or status_flags.get("storno_receipt_open"):
-                issues.append("receipt_open")
-            if status_flags.get("no_paper"):
-                issues.append("no_paper")
-            if status_flags.get("cover_open"):
-                issues.append("cover_open")
-            if status_flags.get("clock_not_set"):
-                issues.append("clock_not_set")
+                if status_flags.get("fiscal_receipt_open") or status_flags.get("service_receipt_open") or status_flags.get("storno_receipt_open"):
+                    issues.append("receipt_open")
+                if status_flags.get("no_paper"):
+                    issues.append("no_paper")
+                if status_flags.get("cover_open"):
+                    issues.append("cover_open")
+                if status_flags.get("clock_not_set"):
+                    issues.append("clock_not_set")
             
-            seq = _diagnostic_status(transport, adapter, seq, timeout_s, printer_id)
-            _SEQ_BY_PRINTER[printer_id] = seq
+                seq = _diagnostic_status(transport, adapter, seq, timeout_s, printer_id)
+                _SEQ_BY_PRINTER[printer_id] = seq
             
-            if issues:
-                issue_msgs = {
-                    "receipt_open": "Отворен бон",
-                    "no_paper": "Няма хартия",
-                    "cover_open": "Отворен капак",
-                    "clock_not_set": "Часовникът не е настроен",
-                }
-                message = ", ".join([issue_msgs.get(i, i) for i in issues])
-                return {"status": "warning", "message": message, "issues": issues}
+                if issues:
+                    issue_msgs = {
+                        "receipt_open": "Отворен бон",
+                        "no_paper": "Няма хартия",
+                        "cover_open": "Отворен капак",
+                        "clock_not_set": "Часовникът не е настроен",
+                    }
+                    message = ", ".join([issue_msgs.get(i, i) for i in issues])
+                    return {"status": "warning", "message": message, "issues": issues}
             
-            return {"status": "ok", "message": "Принтерът е готов", "issues": []}
-        finally:
-            transport.close()
-    except Exception as e:
-        error_msg = str(e)
-        issues = []
-        if "no paper" in error_msg.lower() or "хартия" in error_msg.lower():
-            issues.append("no_paper")
-        if "cover" in error_msg.lower() or "капак" in error_msg.lower():
-            issues.append("cover_open")
-        if "connection" in error_msg.lower() or "serial" in error_msg.lower():
-            issues.append("connection_error")
-        if "отворен" in error_msg.lower() or "open" in error_msg.lower():
-            issues.append("receipt_open")
+                return {"status": "ok", "message": "Принтерът е готов", "issues": []}
+            finally:
+                transport.close()
+        except Exception as e:
+            error_msg = str(e)
+            issues = []
+            if "no paper" in error_msg.lower() or "хартия" in error_msg.lower():
+                issues.append("no_paper")
+            if "cover" in error_msg.lower() or "капак" in error_msg.lower():
+                issues.append("cover_open")
+            if "connection" in error_msg.lower() or "serial" in error_msg.lower():
+                issues.append("connection_error")
+            if "отворен" in error_msg.lower() or "open" in error_msg.lower():
+                issues.append("receipt_open")
         
-        return {
-            "status": "error",
-            "message": error_msg[:200],
-            "issues": issues if issues else ["unknown_error"]
-        }
+            return {
+                "status": "error",
+                "message": error_msg[:200],
+                "issues": issues if issues else ["unknown_error"]
+            }
 
 
 @router.get("/printers/{printer_id}/datetime")
-def read_printer_datetime(printer_id: int) -> Dict[str, Any]:
+async def read_printer_datetime(printer_id: int, fresh: bool = Query(False, description="Skip the cached result (still shares an in-flight query)")) -> Dict[str, Any]:
+    return await device_queries.get(
+        printer_id, "datetime", lambda: device_executors.run(printer_id, _read_datetime_io, printer_id), fresh
+    )
+
+
+def _read_datetime_io(printer_id: int) -> Dict[str, Any]:
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
 
-    try:
-        adapter = get_adapter(printer["model"], printer.get("config") or {})
-        if not isinstance(adapter, DatecsBaseAdapter):
-            raise HTTPException(status_code=400, detail="Only Datecs printers support time sync")
-
-        from app.transports.factory import create_transport as _create_transport
-        from app.datecs_fiscal import _SEQ_BY_PRINTER, _read_printer_datetime
-
-        transport = _create_transport(printer)
-        transport.open()
+    with trace_scope(printer):
         try:
-            seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
-            timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
-            seq, raw, parsed = _read_printer_datetime(
-                transport,
-                adapter,
-                seq,
-                timeout_s,
-                printer_id,
-            )
-            _SEQ_BY_PRINTER[printer_id] = seq
-            host_now = datetime.now()
-            delta_seconds = int((host_now - parsed).total_seconds()) if parsed else None
-            return {
-                "printer_time": raw,
-                "printer_time_iso": parsed.isoformat() if parsed else None,
-                "host_time": host_now.strftime("%d-%m-%y %H:%M:%S"),
-                "host_time_iso": host_now.isoformat(),
-                "delta_seconds": delta_seconds,
-            }
-        finally:
-            transport.close()
-    except HTTPException:
-        raise
-    except Exception as e:
-        log_error("DATECS_READ_DATETIME_FAILED", {"printer_id": printer_id, "error": str(e)})
-        raise HTTPException(status_code=500, detail=f"Failed to read printer date/time: {str(e)}")
+            adapter = get_adapter(printer["model"], printer.get("config") or {})
+            if not isinstance(adapter, DatecsBaseAdapter):
+                raise HTTPException(status_code=400, detail="Only Datecs printers support time sync")
+
+            from app.transports.factory import create_transport as _create_transport
+            from app.datecs_fiscal import _SEQ_BY_PRINTER, _read_printer_datetime
+
+            transport = _create_transport(printer)
+            transport.open()
+            try:
+                seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
+                timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
+                seq, raw, parsed = _read_printer_datetime(
+                    transport,
+                    adapter,
+                    seq,
+                    timeout_s,
+                    printer_id,
+                )
+                _SEQ_BY_PRINTER[printer_id] = seq
+                host_now = datetime.now()
+                delta_seconds = int((host_now - parsed).total_seconds()) if parsed else None
+                return {
+                    "printer_time": raw,
+                    "printer_time_iso": parsed.isoformat() if parsed else None,
+                    "host_time": host_now.strftime("%d-%m-%y %H:%M:%S"),
+                    "host_time_iso": host_now.isoformat(),
+                    "delta_seconds": delta_seconds,
+                }
+            finally:
+                transport.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            log_error("DATECS_READ_DATETIME_FAILED", {"printer_id": printer_id, "error": str(e)})
+            raise HTTPException(status_code=500, detail=f"Failed to read printer date/time: {str(e)}")
 
 
 @router.post("/printers/{printer_id}/datetime/sync")
-def sync_printer_datetime(printer_id: int, payload: Dict[str, Any] | None = Body(default=None)) -> Dict[str, Any]:
+async def sync_printer_datetime(
+    printer_id: int, payload: Dict[str, Any] | None = Body(default=None)
+) -> Dict[str, Any]:
+    try:
+        return await device_executors.run(printer_id, _sync_datetime_io, printer_id, payload)
+    finally:
+        # After the write, so a read overlapping it is not served for the TTL.
+        device_queries.invalidate(printer_id, "datetime")
+
+
+def _sync_datetime_io(printer_id: int, payload: Dict[str, Any] | None) -> Dict[str, Any]:
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
@@ -438,53 +855,54 @@ def sync_printer_datetime(printer_id: int, payload: Dict[str, Any] | None = Body
     payload = payload or {}
     value = payload.get("datetime") or payload.get("value") or payload.get("time")
 
-    try:
-        adapter = get_adapter(printer["model"], printer.get("config") or {})
-        if not isinstance(adapter, DatecsBaseAdapter):
-            raise HTTPException(status_code=400, detail="Only Datecs printers support time sync")
-
-        from app.transports.factory import create_transport as _ct
-        from app.datecs_fiscal import _SEQ_BY_PRINTER, _parse_printer_datetime, _set_printer_datetime
-
-        if value:
-            parsed = None
-            if isinstance(value, str):
-                text = value.strip()
-                try:
-                    parsed = datetime.fromisoformat(text.replace("Z", ""))
-                except ValueError:
-                    parsed = _parse_printer_datetime(text)
-            if not parsed:
-                raise HTTPException(status_code=400, detail="Invalid datetime format")
-            target_time = parsed
-        else:
-            target_time = datetime.now()
-
-        transport = _ct(printer)
-        transport.open()
+    with trace_scope(printer):
         try:
-            seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
-            timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
-            seq = _set_printer_datetime(
-                transport,
-                adapter,
-                seq,
-                timeout_s,
-                printer_id,
-                target_time,
-            )
-            _SEQ_BY_PRINTER[printer_id] = seq
-            return {
-                "status": "ok",
-                "set_time": target_time.strftime("%d-%m-%y %H:%M:%S"),
-            }
-        finally:
-            transport.close()
-    except HTTPException:
-        raise
-    except Exception as e:
-        log_error("DATECS_SYNC_DATETIME_FAILED", {"printer_id": printer_id, "error": str(e)})
-        raise HTTPException(status_code=500, detail=f"Failed to sync printer date/time: {str(e)}")
+            adapter = get_adapter(printer["model"], printer.get("config") or {})
+            if not isinstance(adapter, DatecsBaseAdapter):
+                raise HTTPException(status_code=400, detail="Only Datecs printers support time sync")
+
+            from app.transports.factory import create_transport as _ct
+            from app.datecs_fiscal import _SEQ_BY_PRINTER, _parse_printer_datetime, _set_printer_datetime
+
+            if value:
+                parsed = None
+                if isinstance(value, str):
+                    text = value.strip()
+                    try:
+                        parsed = datetime.fromisoformat(text.replace("Z", ""))
+                    except ValueError:
+                        parsed = _parse_printer_datetime(text)
+                if not parsed:
+                    raise HTTPException(status_code=400, detail="Invalid datetime format")
+                target_time = parsed
+            else:
+                target_time = datetime.now()
+
+            transport = _ct(printer)
+            transport.open()
+            try:
+                seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
+                timeout_s = int(printer.get("timeout_ms", 5000)) / 1000
+                seq = _set_printer_datetime(
+                    transport,
+                    adapter,
+                    seq,
+                    timeout_s,
+                    printer_id,
+                    target_time,
+                )
+                _SEQ_BY_PRINTER[printer_id] = seq
+                return {
+                    "status": "ok",
+                    "set_time": target_time.strftime("%d-%m-%y %H:%M:%S"),
+                }
+            finally:
+                transport.close()
+        except HTTPException:
+            raise
+        except Exception as e:
+            log_error("DATECS_SYNC_DATETIME_FAILED", {"printer_id": printer_id, "error": str(e)})
+            raise HTTPException(status_code=500, detail=f"Failed to sync printer date/time: {str(e)}")
 
 
 # ── Pinpad (card reader) endpoints ─────────────────────────────────────
@@ -496,9 +914,8 @@ async def pinpad_ping(printer_id: int) -> Dict[str, Any]:
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
     try:
-        result = await asyncio.wait_for(
-            asyncio.to_thread(send_payload, printer, "pinpad_ping", {}),
-            timeout=10,
+        result = await device_executors.run_cancellable(
+            printer_id, 10, send_payload, printer, "pinpad_ping", {}
         )
         return result or {"alive": False}
     except Exception as exc:
@@ -507,15 +924,17 @@ async def pinpad_ping(printer_id: int) -> Dict[str, Any]:
 
 
 @router.get("/printers/{printer_id}/pinpad/info")
-async def pinpad_info(printer_id: int) -> Dict[str, Any]:
+async def pinpad_info(printer_id: int, fresh: bool = Query(False, description="Skip the cached result (still shares an in-flight query)")) -> Dict[str, Any]:
     """Get pinpad device info (model, serial, software version, terminal ID)."""
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
     try:
-        result = await asyncio.wait_for(
-            asyncio.to_thread(send_payload, printer, "pinpad_info", {}),
-            timeout=10,
+        result = await device_queries.get(
+            printer_id,
+            "pinpad_info",
+            lambda: device_executors.run_cancellable(printer_id, 10, send_payload, printer, "pinpad_info", {}),
+            fresh,
         )
         return result or {}
     except Exception as exc:
@@ -524,15 +943,17 @@ async def pinpad_info(printer_id: int) -> Dict[str, Any]:
 
 
 @router.get("/printers/{printer_id}/pinpad/status")
-async def pinpad_status(printer_id: int) -> Dict[str, Any]:
+async def pinpad_status(printer_id: int, fresh: bool = Query(False, description="Skip the cached result (still shares an in-flight query)")) -> Dict[str, Any]:
     """Get pinpad status (reversal, end-of-day, reader state, report count)."""
     printer = get_printer(printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Printer not found")
     try:
-        result = await asyncio.wait_for(
-            asyncio.to_thread(send_payload, printer, "pinpad_status", {}),
-            timeout=10,
+        result = await device_queries.get(
+            printer_id,
+            "pinpad_status",
+            lambda: device_executors.run_cancellable(printer_id, 10, send_payload, printer, "pinpad_status", {}),
+            fresh,
         )
         return result or {}
     except Exception as exc:
@@ -555,9 +976,8 @@ async def pinpad_purchase(printer_id: int, body: Dict[str, Any] = Body(...)) ->
     lock = job_queue.get_lock(printer_id)
     async with lock:
         try:
-            result = await asyncio.wait_for(
-                asyncio.to_thread(send_payload, printer, "pinpad_purchase", body),
-                timeout=120,
+            result = await device_executors.run_cancellable(
+                printer_id, 120, send_payload, printer, "pinpad_purchase", body
             )
             return result or {}
         except asyncio.TimeoutError:
@@ -582,9 +1002,8 @@ async def pinpad_void(printer_id: int, body: Dict[str, Any] = Body(...)) -> Dict
     lock = job_queue.get_lock(printer_id)
     async with lock:
         try:
-            result = await asyncio.wait_for(
-                asyncio.to_thread(send_payload, printer, "pinpad_void", body),
-                timeout=120,
+            result = await device_executors.run_cancellable(
+                printer_id, 120, send_payload, printer, "pinpad_void", body
             )
             return result or {}
         except asyncio.TimeoutError:
@@ -604,9 +1023,8 @@ async def pinpad_end_of_day(printer_id: int) -> Dict[str, Any]:
     lock = job_queue.get_lock(printer_id)
     async with lock:
         try:
-            result = await asyncio.wait_for(
-                asyncio.to_thread(send_payload, printer, "pinpad_end_of_day", {}),
-                timeout=330,
+            result = await device_executors.run_cancellable(
+                printer_id, 330, send_payload, printer, "pinpad_end_of_day", {}
             )
             return result or {}
         except asyncio.TimeoutError:
@@ -626,9 +1044,8 @@ async def pinpad_test_connection(printer_id: int) -> Dict[str, Any]:
     lock = job_queue.get_lock(printer_id)
     async with lock:
         try:
-            result = await asyncio.wait_for(
-                asyncio.to_thread(send_payload, printer, "pinpad_test", {}),
-                timeout=120,
+            result = await device_executors.run_cancellable(
+                printer_id, 120, send_payload, printer, "pinpad_test", {}
             )
             return result or {}
         except asyncio.TimeoutError:
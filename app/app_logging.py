@@ -1,23 +1,245 @@
 from __future__ import annotations
 
+import atexit
 import logging
-from typing import Any, Dict, Optional
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
 
-from app.db import create_log
+from app.db import now_iso, purge_expired_logs
+from app.log_sinks import LogSink, build_sinks
+from app.settings import (
+    LOG_FLUSH_BATCH,
+    LOG_FLUSH_INTERVAL_MS,
+    LOG_PURGE_INTERVAL_S,
+    LOG_QUEUE_SIZE,
+    LOG_SINK_CONFIG,
+    LOG_SINKS,
+)
 
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s %(message)s")
 
+logger = logging.getLogger("app_logging")
+
+
+class LogWriter:
+    """Background writer that persists log records in batches.
+
+    Callers only enqueue; a single daemon thread drains the queue and hands
+    up to ``batch_size`` records at a time to every sink (SQLite, NDJSON
+    file, stdout — see app/log_sinks.py), at least every ``interval_s``
+    seconds. When the queue is full new records are dropped
+    and counted instead of blocking the caller (i.e. the printer I/O path).
+    The same thread drops expired log partitions every ``purge_interval_s``.
+
+    Records only leave the queue under ``_write_lock``, so once ``flush()``
+    has drained it, everything enqueued before the call has been written.
+
+    After ``stop()`` the sinks are closed and the writer is not restarted
+    lazily: late records (from threads still finishing) go straight to
+    stderr until ``start()`` is called again.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        interval_s: float,
+        max_queue: int,
+        sinks: Sequence[LogSink],
+        purge_interval_s: float = 3600,
+    ) -> None:
+        self.sinks = list(sinks)
+        self._batch_size = max(1, batch_size)
+        self._interval_s = max(0.01, interval_s)
+        self._purge_interval_s = purge_interval_s
+        self._next_purge = 0.0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stopped = False
+        # Set when a full batch is waiting, so the writer does not sleep out its interval.
+        self._wake = threading.Event()
+        self._state_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dropped = 0
+        self._written: Dict[str, int] = {sink.name: 0 for sink in self.sinks}
+        self._failed: Dict[str, int] = {sink.name: 0 for sink in self.sinks}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self._start(lazy=False)
+
+    def _start(self, lazy: bool) -> bool:
+        """Start the thread; the lazy start from ``enqueue`` is refused after ``stop()``."""
+        with self._state_lock:
+            if lazy and self._stopped:
+                return False
+            if self.running:
+                return True
+            self._stopped = False
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the writer thread and flush everything still queued."""
+        with self._state_lock:
+            thread = self._thread
+            self._stopped = True
+            self._stop_event.set()
+            self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+    def enqueue(
+        self,
+        level: str,
+        message: str,
+        context: Optional[Dict[str, Any]],
+        created_at: Optional[str] = None,
+    ) -> None:
+        if self._stopped or (not self.running and not self._start(lazy=True)):
+            logger.warning("LOG_AFTER_STOP %s %s %s", level, message, context or "")
+            return
+        entry = {
+            "level": level,
+            "message": message,
+            "context": context,
+            "created_at": created_at or now_iso(),
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._state_lock:
+                self._dropped += 1
+            return
+        if self._queue.qsize() >= self._batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Synchronously write every queued record from the calling thread.
+
+        Records logged by other threads after the call may be written too,
+        but are never waited for.
+        """
+        with self._write_lock:
+            return self._drain()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self._dropped,
+            "sinks": {
+                sink.name: {
+                    **sink.describe(),
+                    "written": self._written[sink.name],
+                    "failed": self._failed[sink.name],
+                }
+                for sink in self.sinks
+            },
+        }
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake.wait(self._interval_s)
+            self._wake.clear()
+            with self._write_lock:
+                self._drain()
+            if self._purge_interval_s > 0 and time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + self._purge_interval_s
+                self._purge()
+
+    def _purge(self) -> None:
+        try:
+            dropped = purge_expired_logs()
+        except Exception:  # noqa: BLE001
+            logger.exception("LOG_PURGE_FAILED")
+            return
+        if dropped:
+            logger.info("LOG_PURGE dropped %s", ", ".join(dropped))
+
+    def _drain(self) -> int:
+        """Write the queue in batches of ``batch_size``. Caller holds ``_write_lock``."""
+        written = 0
+        batch = self._take()
+        while batch:
+            written += self._write(batch)
+            batch = self._take()
+        return written
+
+    def _take(self) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> int:
+        """Offer the batch to every sink. Returns the number of records taken."""
+        for sink in self.sinks:
+            accepted = [entry for entry in batch if sink.accepts(entry)]
+            if not accepted:
+                continue
+            try:
+                self._written[sink.name] += sink.write(accepted)
+            except Exception:  # noqa: BLE001
+                self._failed[sink.name] += len(accepted)
+                logger.exception(
+                    "LOG_WRITER_FLUSH_FAILED sink=%s (%d records lost)", sink.name, len(accepted)
+                )
+        return len(batch)
+
+
+log_writer = LogWriter(
+    batch_size=LOG_FLUSH_BATCH,
+    interval_s=LOG_FLUSH_INTERVAL_MS / 1000,
+    max_queue=LOG_QUEUE_SIZE,
+    sinks=build_sinks(LOG_SINKS, LOG_SINK_CONFIG),
+    purge_interval_s=LOG_PURGE_INTERVAL_S,
+)
+
+# Scripts that import the protocol modules never call stop_log_writer();
+# make sure their last records still reach the database.
+atexit.register(log_writer.flush)
+
+
+def start_log_writer() -> None:
+    log_writer.start()
+
+
+def stop_log_writer() -> None:
+    log_writer.stop()
+
+
+def flush_logs() -> int:
+    return log_writer.flush()
+
+
+def log_trace(message: str, context: Optional[Dict[str, Any]] = None) -> None:
+    """Frame-level protocol event; stored under the short "trace" retention."""
+    log_writer.enqueue("trace", message, context)
+
 
 def log_info(message: str, context: Optional[Dict[str, Any]] = None) -> None:
-    logging.info(message)
-    create_log("info", message, context)
+    log_writer.enqueue("info", message, context)
 
 
 def log_warning(message: str, context: Optional[Dict[str, Any]] = None) -> None:
-    logging.warning(message)
-    create_log("warning", message, context)
+    log_writer.enqueue("warning", message, context)
 
 
-def log_error(message: str, context: Optional[Dict[str, Any]] = None) -> None:
-    logging.error(message)
-    create_log("error", message, context)
+def log_error(message: str, context: Optional[Dict[str, Any]] = None, flush: bool = False) -> None:
+    """Log an error; ``flush=True`` persists it (and everything before it) immediately."""
+    log_writer.enqueue("error", message, context)
+    if flush:
+        log_writer.flush()
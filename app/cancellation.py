@@ -0,0 +1,77 @@
+"""Cooperative cancellation of blocking device operations.
+
+``asyncio.wait_for`` can only abandon the coroutine awaiting a worker
+thread; the thread itself keeps talking to the device. A ``CancelToken`` is
+handed to the device entry points (``send_payload``, ``fiscal_operation``,
+``probe_printer``), which install it with ``cancel_scope`` for the rest of
+the call. The protocol read loops and the per-frame send path call
+``check_cancelled()``, so a cancelled operation raises
+``OperationCancelled`` within one frame and its ``finally`` blocks close the
+transport.
+
+Like ``trace_scope`` the token travels in a context variable, so the helpers
+between the entry point and the read loops need no extra parameter.
+"""
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class OperationCancelled(RuntimeError):
+    pass
+
+
+class CancelToken:
+    """Thread-safe flag set by the event loop, polled by the device thread."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise OperationCancelled(f"Operation cancelled: {self.reason}")
+
+    def sleep(self, seconds: float) -> None:
+        """``time.sleep`` that wakes up (and raises) on cancellation."""
+        if self._event.wait(seconds):
+            self.raise_if_cancelled()
+
+
+_current_token: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+@contextmanager
+def cancel_scope(token: Optional[CancelToken]) -> Iterator[Optional[CancelToken]]:
+    """Make ``token`` the current token; ``None`` keeps the enclosing one."""
+    if token is None:
+        yield _current_token.get()
+        return
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def check_cancelled(token: Optional[CancelToken] = None) -> None:
+    """Raise ``OperationCancelled`` if ``token`` (or the current one) is cancelled."""
+    token = token or _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
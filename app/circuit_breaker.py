@@ -0,0 +1,125 @@
+"""Per-printer circuit breaker for the job dispatcher.
+
+After ``BREAKER_FAILURE_THRESHOLD`` consecutive transport failures (port
+cannot be opened, socket errors, no response within the timeout) the
+breaker opens and the printer's lane stops dispatching jobs. While open,
+a single cheap probe (``printer_service.probe_printer``) runs on
+exponential backoff with jitter; the first successful probe closes the
+breaker and the queued jobs resume.
+
+Errors reported by the device itself (paper out, fiscal errors, declined
+card) prove the link works and reset the failure count.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.datecs_protocol import DatecsTimeoutError
+from app.datecspay_protocol import PinpadTimeoutError
+from app.settings import (
+    BREAKER_BACKOFF_BASE_S,
+    BREAKER_BACKOFF_MAX_S,
+    BREAKER_FAILURE_THRESHOLD,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_transport_failure(exc: BaseException) -> bool:
+    """True when ``exc`` means the printer could not be reached at all."""
+    # OSError covers serial.SerialException, socket errors and TimeoutError
+    # (which is also what asyncio.wait_for raises on the job timeout).
+    return isinstance(exc, (OSError, DatecsTimeoutError, PinpadTimeoutError))
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class CircuitBreaker:
+    """Breaker state for one printer; used from the event loop thread only."""
+
+    def __init__(
+        self,
+        printer_id: int,
+        threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_s: float = BREAKER_BACKOFF_BASE_S,
+        max_s: float = BREAKER_BACKOFF_MAX_S,
+    ) -> None:
+        self.printer_id = printer_id
+        self.threshold = max(1, threshold)
+        self.base_s = base_s
+        self.max_s = max_s
+        self.state = CLOSED
+        self.failures = 0
+        self.probe_attempts = 0
+        self.last_error: Optional[str] = None
+        self.opened_at: Optional[float] = None
+        self.next_probe_at: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+        # Set to run the next probe immediately (manual reset, shutdown).
+        self.wake = asyncio.Event()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != CLOSED
+
+    def record_success(self) -> bool:
+        """Close the breaker. True if it was open."""
+        was_open = self.is_open
+        self.state = CLOSED
+        self.failures = 0
+        self.probe_attempts = 0
+        self.opened_at = None
+        self.next_probe_at = None
+        return was_open
+
+    def record_failure(self, exc: BaseException) -> bool:
+        """Count a transport failure. True if this one tripped the breaker."""
+        self.failures += 1
+        self.last_error = str(exc) or type(exc).__name__
+        if self.state == CLOSED and self.failures >= self.threshold:
+            self.state = OPEN
+            self.opened_at = time.time()
+            self.probe_attempts = 0
+            return True
+        return False
+
+    def record_probe_failure(self, exc: BaseException) -> None:
+        self.state = OPEN
+        self.probe_attempts += 1
+        self.last_error = str(exc) or type(exc).__name__
+
+    def next_delay(self) -> float:
+        """Backoff before the next probe: base * 2^attempts, capped, with jitter."""
+        delay = min(self.max_s, self.base_s * (2 ** self.probe_attempts))
+        delay = random.uniform(delay / 2, delay)
+        self.next_probe_at = time.time() + delay
+        return delay
+
+    def begin_probe(self) -> None:
+        self.state = HALF_OPEN
+        self.wake.clear()
+        self.last_probe_at = time.time()
+        self.next_probe_at = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "printer_id": self.printer_id,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "threshold": self.threshold,
+            "probe_attempts": self.probe_attempts,
+            "last_error": self.last_error,
+            "opened_at": _iso(self.opened_at),
+            "next_probe_at": _iso(self.next_probe_at),
+            "last_probe_at": _iso(self.last_probe_at),
+        }
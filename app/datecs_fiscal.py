@@ -6,7 +6,9 @@ from uuid import uuid4
 
 from app.adapters.datecs_base import DatecsBaseAdapter
 from app.app_logging import log_error, log_info, log_warning
+from app.cancellation import CancelToken, cancel_scope, check_cancelled
 from app.datecs_protocol import DatecsProtocolError, DatecsResponse, next_seq, send_command
+from app.trace import set_trace_correlation, trace_frame
 from app.transports import BaseTransport
 from app.transports.factory import create_transport
 
@@ -367,6 +369,8 @@ def _send_with_response(
     correlation_id: str | None = None,
     skip_raise: bool = False,
 ):
+    # Every command is a frame boundary: stop here once the job is cancelled.
+    check_cancelled()
     payload = _encode_data(adapter, data)
     protocol_format = getattr(adapter, "protocol_format", "hex4")
     status_length = int(getattr(adapter, "status_length", 8) or 8)
@@ -390,7 +394,7 @@ def _send_with_response(
         "nra data",
         "set operator name",
     }:
-        log_info(
+        trace_frame(
             "DATECS_SEND",
             {
                 "context": context,
@@ -1142,9 +1146,23 @@ def fiscal_operation(
     payload_type: str,
     payload: Dict[str, Any],
     dry_run: bool = False,
+    cancel_token: Optional[CancelToken] = None,
+) -> Dict[str, Any]:
+    """Run a fiscal payload; ``cancel_token`` stops it at the next frame."""
+    with cancel_scope(cancel_token):
+        return _fiscal_operation(printer, adapter, payload_type, payload, dry_run=dry_run)
+
+
+def _fiscal_operation(
+    printer: Dict[str, Any],
+    adapter: DatecsBaseAdapter,
+    payload_type: str,
+    payload: Dict[str, Any],
+    dry_run: bool = False,
 ) -> Dict[str, Any]:
     printer_id = int(printer.get("id") or 0)
     correlation_id = uuid4().hex
+    set_trace_correlation(correlation_id)
     timeout_ms = int(printer.get("timeout_ms", 5000))
     if dry_run:
         log_info(
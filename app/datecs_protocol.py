@@ -5,6 +5,9 @@ from dataclasses import dataclass
 from typing import List, Optional
 
 from app.app_logging import log_warning
+from app.cancellation import CancelToken, check_cancelled, current_token
+from app.metrics import DATECS_NAKS, DATECS_RETRIES, DATECS_RTT, DATECS_TIMEOUTS
+from app.trace import trace_error, trace_frame
 from app.transports import BaseTransport
 
 PRE = 0x01
@@ -153,11 +156,14 @@ def read_response(
     timeout_s: float = 1.0,
     protocol_format: str = "hex4",
     status_length: int = 8,
+    cancel_token: Optional[CancelToken] = None,
 ) -> DatecsResponse:
+    token = cancel_token or current_token()
     deadline = time.monotonic() + timeout_s
     buffer = bytearray()
     saw_preamble = False
     while time.monotonic() < deadline:
+        check_cancelled(token)
         chunk = transport.read(1)
         if not chunk:
             time.sleep(0.001)
@@ -165,6 +171,7 @@ def read_response(
         byte = chunk[0]
         if not saw_preamble:
             if byte == NAK:
+                DATECS_NAKS.inc()
                 raise DatecsProtocolError("NAK received.")
             if byte == SYN:
                 deadline = time.monotonic() + timeout_s
@@ -175,7 +182,7 @@ def read_response(
         buffer.append(byte)
         if byte == EOT:
             return parse_response(bytes(buffer), protocol_format=protocol_format, status_length=status_length)
-    raise DatecsProtocolError(
+    raise DatecsTimeoutError(
         f"Timeout waiting for Datecs response after {timeout_s}s. "
         f"Check: 1) Printer is ON, 2) Correct connection (COM port / IP address), "
         f"3) Correct baudrate or TCP port, 4) Cable/network is connected, "
@@ -193,11 +200,14 @@ def send_command(
     protocol_format: str = "hex4",
     status_length: int = 8,
 ) -> DatecsResponse:
-    from app.app_logging import log_info, log_error
     last_error: Optional[Exception] = None
+    command = f"0x{cmd:02X}"
     for attempt in range(retries + 1):
+        check_cancelled()
+        if attempt:
+            DATECS_RETRIES.labels(command).inc()
         frame = build_request(cmd, data=data, seq=seq, protocol_format=protocol_format)
-        log_info("DATECS_PROTOCOL_SEND", {
+        trace_frame("DATECS_PROTOCOL_SEND", {
             "attempt": attempt + 1,
             "cmd": f"0x{cmd:02X}",
             "seq": f"0x{seq:02X}",
@@ -205,6 +215,7 @@ def send_command(
             "frame_len": len(frame),
             "protocol_format": protocol_format,
         })
+        started = time.perf_counter()
         transport.write(frame)
         try:
             response = read_response(
@@ -213,7 +224,8 @@ def send_command(
                 protocol_format=protocol_format,
                 status_length=status_length,
             )
-            log_info("DATECS_PROTOCOL_RECV", {
+            DATECS_RTT.labels(command).observe(time.perf_counter() - started)
+            trace_frame("DATECS_PROTOCOL_RECV", {
                 "cmd": f"0x{cmd:02X}",
                 "seq": f"0x{seq:02X}",
                 "status_hex": response.status.hex(),
@@ -221,14 +233,16 @@ def send_command(
             })
             return response
         except DatecsProtocolError as exc:
-            log_error("DATECS_PROTOCOL_ERROR", {
+            if isinstance(exc, DatecsTimeoutError):
+                DATECS_TIMEOUTS.labels(command).inc()
+            trace_error("DATECS_PROTOCOL_ERROR", {
                 "attempt": attempt + 1,
                 "cmd": f"0x{cmd:02X}",
                 "error": str(exc),
             })
             last_error = exc
             continue
-    raise last_error or DatecsProtocolError("No response from printer.")
+    raise last_error or DatecsTimeoutError("No response from printer.")
 
 
 def next_seq(current: int) -> int:
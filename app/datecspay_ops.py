@@ -12,6 +12,8 @@ from dataclasses import asdict
 from typing import Any, Dict, Optional
 
 from app.app_logging import log_info, log_warning, log_error
+from app.cancellation import CancelToken, check_cancelled, current_token
+from app.trace import trace_frame
 from app.transports import BaseTransport
 from app.datecspay_protocol import (
     # Constants
@@ -239,9 +241,13 @@ def _transaction_loop(
     transport: BaseTransport,
     timeout_s: float = TRANSACTION_TIMEOUT,
     correlation_id: str = "",
+    cancel_token: Optional[CancelToken] = None,
 ) -> TransactionResult:
     """Run the transaction event loop until TRANSACTION COMPLETE.
 
+    ``cancel_token`` (default: the current ``cancel_scope`` token) is checked on
+    every pass, so a cancelled transaction stops within one packet read.
+
     Handles:
     - Borica events (transaction complete, intermediate, hang receipt)
     - External internet events (socket open/close/send data)
@@ -260,12 +266,14 @@ def _transaction_loop(
         "correlation_id": correlation_id,
     })
 
+    token = cancel_token or current_token()
     try:
         while time.monotonic() < deadline:
+            check_cancelled(token)
             # ── 1. Drain any events queued during send_command calls ──
             while _pending_events:
                 raw = _pending_events.pop(0)
-                log_info("PINPAD_TXLOOP_QUEUED", {
+                trace_frame("PINPAD_TXLOOP_QUEUED", {
                     "pkt_type": f"0x{raw[1]:02X}" if len(raw) > 1 else "?",
                     "raw_len": len(raw),
                     "raw_hex": raw[:48].hex(),
@@ -314,7 +322,7 @@ def _transaction_loop(
                 continue
 
             pkt_type = raw[1]
-            log_info("PINPAD_TXLOOP_PKT", {
+            trace_frame("PINPAD_TXLOOP_PKT", {
                 "pkt_type": f"0x{pkt_type:02X}",
                 "raw_len": len(raw),
                 "raw_hex": raw[:48].hex(),
@@ -23,6 +23,8 @@ from enum import IntEnum
 from typing import Any, Dict, List, Optional, Tuple
 
 from app.app_logging import log_info, log_warning, log_error
+from app.cancellation import check_cancelled, current_token
+from app.trace import trace_frame
 from app.transports import BaseTransport
 
 
@@ -530,11 +532,13 @@ def _read_packet(transport: BaseTransport, timeout_s: float = RESPONSE_TIMEOUT)
 
     Waits for START_BYTE, then reads header to get length, then reads rest.
     """
+    token = current_token()
     deadline = time.monotonic() + timeout_s
     buffer = bytearray()
     saw_start = False
 
     while time.monotonic() < deadline:
+        check_cancelled(token)
         chunk = transport.read(1)
         if not chunk:
             time.sleep(0.005)
@@ -582,7 +586,7 @@ def send_command(
     in _pending_events so the transaction loop can pick it up.
     """
     packet = build_packet(cmd, data)
-    log_info("PINPAD_SEND", {
+    trace_frame("PINPAD_SEND", {
         "cmd": f"0x{cmd:02X}",
         "data_hex": data.hex() if data else "",
         "packet_len": len(packet),
@@ -595,7 +599,7 @@ def send_command(
         remaining = max(0.1, deadline - time.monotonic())
         raw = _read_packet(transport, remaining)
         pkt_type = raw[1] if len(raw) > 1 else 0xFF
-        log_info("PINPAD_RAW_PKT", {
+        trace_frame("PINPAD_RAW_PKT", {
             "pkt_type": f"0x{pkt_type:02X}",
             "raw_len": len(raw),
             "raw_hex": raw[:32].hex(),
@@ -604,7 +608,7 @@ def send_command(
         if pkt_type == 0x00:
             # This is the response we're waiting for
             response = parse_response_packet(raw)
-            log_info("PINPAD_RECV", {
+            trace_frame("PINPAD_RECV", {
                 "status": f"0x{response.status:02X}",
                 "status_name": response.status_name,
                 "data_len": len(response.data),
@@ -633,7 +637,7 @@ def read_event(
     """Read an async event from the card reader."""
     raw = _read_packet(transport, timeout_s)
     event = parse_event_packet(raw)
-    log_info("PINPAD_EVENT", {
+    trace_frame("PINPAD_EVENT", {
         "event_type": f"0x{event.event_type:02X}",
         "subevent": f"0x{event.subevent:02X}",
         "data_len": len(event.data),
@@ -1,26 +1,110 @@
 from __future__ import annotations
 
+import copy
 import json
+import re
 import sqlite3
-from datetime import datetime, timezone
-from typing import Any, Dict, Iterable, List, Optional
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
-from app.settings import DATA_DIR, DB_PATH
+from app.settings import (
+    DATA_DIR,
+    DB_PATH,
+    JOB_IDEMPOTENCY_WINDOW_S,
+    JOB_LEASE_SECONDS,
+    LOG_RETENTION_DAYS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHED_STATEMENTS,
+    SQLITE_SYNCHRONOUS,
+)
 
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _connect() -> sqlite3.Connection:
+# One persistent connection per thread. The event loop, the log writer and
+# the to_thread / Starlette worker threads each reuse their own connection
+# instead of reconnecting for every query. ``close_connections`` bumps the
+# generation so threads transparently reopen after a shutdown/restart.
+_local = threading.local()
+_connections: Dict[int, sqlite3.Connection] = {}
+_connections_lock = threading.Lock()
+_generation = 0
+
+
+def _open_connection() -> sqlite3.Connection:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS};")
+    conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)};")
+    return conn
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "generation", -1) == _generation:
+        return conn
+    conn = _open_connection()
+    with _connections_lock:
+        _local.conn = conn
+        _local.generation = _generation
+        _connections[threading.get_ident()] = conn
     return conn
 
 
+def close_connections() -> None:
+    """Close every pooled connection (called on application shutdown)."""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        connections = list(_connections.values())
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    # The next connection may point at a different file (tests, benchmarks).
+    with _log_partitions_lock:
+        _known_log_partitions.clear()
+    printer_registry.invalidate()
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,),
+    ).fetchone()
+    return row is not None
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str]]:
+    return [(row["name"], row["type"]) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _sync_archive_columns(conn: sqlite3.Connection) -> None:
+    """Give jobs_archive every column jobs has, so rows can be moved as-is."""
+    archived = {name for name, _ in _table_columns(conn, "jobs_archive")}
+    for name, col_type in _table_columns(conn, "jobs"):
+        if name not in archived:
+            conn.execute(f"ALTER TABLE jobs_archive ADD COLUMN {name} {col_type}")
+
+
 def init_db() -> None:
-    with _connect() as conn:
+    # Schema setup runs on its own short-lived connection so the
+    # foreign_keys pragma below does not leak into a pooled connection.
+    conn = _open_connection()
+    with conn:
         conn.execute("PRAGMA foreign_keys = ON;")
         conn.execute(
             """
@@ -82,18 +166,86 @@ def init_db() -> None:
             );
             """
         )
+        # Migration: job claiming (which process prints the job, until when)
+        for col in ["owner TEXT", "lease_expires_at TEXT", "heartbeat_at TEXT"]:
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {col}")
+            except sqlite3.OperationalError:
+                pass
+        # Migration: scheduling (higher priority first, then earliest deadline)
+        for col in ["priority INTEGER NOT NULL DEFAULT 0", "deadline TEXT"]:
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {col}")
+            except sqlite3.OperationalError:
+                pass
+        # Migration: idempotency keys (repeat submissions return the same job)
+        try:
+            conn.execute("ALTER TABLE jobs ADD COLUMN idempotency_key TEXT")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency_key ON jobs (idempotency_key) "
+            "WHERE idempotency_key IS NOT NULL"
+        )
+        # Migration: ordered batches (job waits until after_job_id is done)
+        try:
+            conn.execute("ALTER TABLE jobs ADD COLUMN after_job_id INTEGER")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_printer_created ON jobs (printer_id, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)")
+        # Finished jobs past JOB_ARCHIVE_AFTER_DAYS are moved here by
+        # archive_finished_jobs. No foreign key: history outlives printers.
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                level TEXT NOT NULL,
-                message TEXT NOT NULL,
-                context_json TEXT,
-                created_at TEXT NOT NULL
+            CREATE TABLE IF NOT EXISTS jobs_archive (
+                id INTEGER PRIMARY KEY,
+                printer_id INTEGER NOT NULL,
+                payload_type TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                status TEXT NOT NULL,
+                retries INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result_json TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT
             );
             """
         )
+        _sync_archive_columns(conn)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_archive_printer_created ON jobs_archive (printer_id, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_archive_created_at ON jobs_archive (created_at)")
+        # Logs live in per-(level, day) partition tables created on demand
+        # by create_logs. The original single ``logs`` table only exists in
+        # databases created before partitioning; it is read as the oldest
+        # partition and dropped by purge_expired_logs once it ages out.
+        if _table_exists(conn, _LEGACY_LOG_TABLE):
+            # Migration: promote correlation_id / printer_id / job_id out of
+            # context_json into indexed columns. Existing rows are backfilled
+            # once, when the columns are first added.
+            added_log_columns = False
+            for col in ["correlation_id TEXT", "printer_id INTEGER", "job_id INTEGER"]:
+                try:
+                    conn.execute(f"ALTER TABLE logs ADD COLUMN {col}")
+                    added_log_columns = True
+                except sqlite3.OperationalError:
+                    pass
+            if added_log_columns:
+                conn.execute(
+                    """
+                    UPDATE logs SET
+                        correlation_id = json_extract(context_json, '$.correlation_id'),
+                        printer_id = CAST(json_extract(context_json, '$.printer_id') AS INTEGER),
+                        job_id = CAST(json_extract(context_json, '$.job_id') AS INTEGER)
+                    WHERE context_json IS NOT NULL AND json_valid(context_json)
+                    """
+                )
+            _create_log_indexes(conn, _LEGACY_LOG_TABLE)
         conn.commit()
+    conn.close()
 
 
 def _printer_from_row(row: sqlite3.Row) -> Dict[str, Any]:
@@ -107,39 +259,125 @@ def _printer_from_row(row: sqlite3.Row) -> Dict[str, Any]:
 
 def _job_from_row(row: sqlite3.Row) -> Dict[str, Any]:
     data = dict(row)
-    data["payload"] = json.loads(data.get("payload_json") or "{}")
-    data.pop("payload_json", None)
-    result_raw = data.get("result_json")
-    data["result"] = json.loads(result_raw) if result_raw else None
-    data.pop("result_json", None)
+    if "payload_json" in data:
+        data["payload"] = json.loads(data.pop("payload_json") or "{}")
+    if "result_json" in data:
+        result_raw = data.pop("result_json")
+        data["result"] = json.loads(result_raw) if result_raw else None
     return data
 
 
 def _log_from_row(row: sqlite3.Row) -> Dict[str, Any]:
     data = dict(row)
-    context_raw = data.get("context_json")
-    data["context"] = json.loads(context_raw) if context_raw else None
-    data.pop("context_json", None)
+    if "context_json" in data:
+        context_raw = data.pop("context_json")
+        data["context"] = json.loads(context_raw) if context_raw else None
     return data
 
 
+_FIELD_NAME_RE = re.compile(r"^[a-z_]+$")
+
+
+def _projection(
+    fields: Optional[Sequence[str]],
+    json_columns: Dict[str, str],
+    always: Sequence[str] = ("id",),
+    virtual: Sequence[str] = (),
+) -> str:
+    """SELECT list for a ``fields=`` projection; ``*`` when no fields are given.
+
+    ``json_columns`` maps decoded keys (``payload``) to their stored column
+    (``payload_json``); ``virtual`` keys are computed, not selected.
+    """
+    if not fields:
+        return "*"
+    columns = list(always)
+    for field in fields:
+        if not _FIELD_NAME_RE.match(field):
+            raise ValueError(f"Invalid field name: {field}")
+        if field in virtual:
+            continue
+        column = json_columns.get(field, field)
+        if column not in columns:
+            columns.append(column)
+    return ", ".join(columns)
+
+
+class PrinterRegistry:
+    """Process-wide in-memory copy of the printers table.
+
+    Loaded once (at startup or on first lookup) and kept current by
+    create_printer / update_printer / delete_printer. ``version`` increases
+    on every change so dependent caches know when to rebuild. Lookups return
+    copies, so callers may modify them freely.
+    """
+
+    def __init__(self) -> None:
+        self._printers: Optional[Dict[int, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def load(self) -> None:
+        with _connect() as conn:
+            rows = conn.execute("SELECT * FROM printers ORDER BY id ASC").fetchall()
+        printers = {int(row["id"]): _printer_from_row(row) for row in rows}
+        with self._lock:
+            self._printers = printers
+            self._version += 1
+
+    def invalidate(self) -> None:
+        """Drop the cache; the next lookup reloads from the database."""
+        with self._lock:
+            self._printers = None
+            self._version += 1
+
+    def get(self, printer_id: int) -> Optional[Dict[str, Any]]:
+        printer = self._snapshot().get(int(printer_id))
+        return copy.deepcopy(printer) if printer else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        return [copy.deepcopy(printer) for _, printer in sorted(self._snapshot().items())]
+
+    def put(self, printer: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._printers is not None:
+                self._printers[int(printer["id"])] = copy.deepcopy(printer)
+            self._version += 1
+
+    def remove(self, printer_id: int) -> None:
+        with self._lock:
+            if self._printers is not None:
+                self._printers.pop(int(printer_id), None)
+            self._version += 1
+
+    def _snapshot(self) -> Dict[int, Dict[str, Any]]:
+        printers = self._printers
+        if printers is None:
+            self.load()
+            printers = self._printers or {}
+        return printers
+
+
+printer_registry = PrinterRegistry()
+
+
 def list_printers() -> List[Dict[str, Any]]:
-    with _connect() as conn:
-        rows = conn.execute("SELECT * FROM printers ORDER BY id ASC").fetchall()
-    return [_printer_from_row(row) for row in rows]
+    return printer_registry.all()
 
 
 def get_printer(printer_id: int) -> Optional[Dict[str, Any]]:
-    with _connect() as conn:
-        row = conn.execute("SELECT * FROM printers WHERE id = ?", (printer_id,)).fetchone()
-    return _printer_from_row(row) if row else None
+    return printer_registry.get(printer_id)
 
 
 def create_printer(data: Dict[str, Any]) -> Dict[str, Any]:
     now = now_iso()
     config_json = json.dumps(data.get("config") or {}, ensure_ascii=False)
     with _connect() as conn:
-        cur = conn.execute(
+        row = conn.execute(
             """
             INSERT INTO printers
             (name, model, transport, port, baudrate, data_bits, parity, stop_bits, timeout_ms,
@@ -147,6 +385,7 @@ def create_printer(data: Dict[str, Any]) -> Dict[str, Any]:
              serial_number, firmware, fiscal_memory_number,
              created_at, updated_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
             """,
             (
                 data["name"],
@@ -169,10 +408,11 @@ def create_printer(data: Dict[str, Any]) -> Dict[str, Any]:
                 now,
                 now,
             ),
-        )
-        printer_id = cur.lastrowid
+        ).fetchone()
         conn.commit()
-    return get_printer(int(printer_id))
+    printer = _printer_from_row(row)
+    printer_registry.put(printer)
+    return printer
 
 
 def update_printer(printer_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -214,26 +454,66 @@ def update_printer(printer_id: int, data: Dict[str, Any]) -> Optional[Dict[str,
     fields.append("updated_at = ?")
     values.append(now_iso())
     values.append(printer_id)
-    query = f"UPDATE printers SET {', '.join(fields)} WHERE id = ?"
+    query = f"UPDATE printers SET {', '.join(fields)} WHERE id = ? RETURNING *"
     with _connect() as conn:
-        conn.execute(query, values)
+        row = conn.execute(query, values).fetchone()
         conn.commit()
-    return get_printer(printer_id)
+    if not row:
+        return None
+    printer = _printer_from_row(row)
+    printer_registry.put(printer)
+    return printer
 
 
 def delete_printer(printer_id: int) -> None:
     with _connect() as conn:
         conn.execute("DELETE FROM printers WHERE id = ?", (printer_id,))
         conn.commit()
+    printer_registry.remove(printer_id)
+
 
+def list_jobs(
+    limit: int = 50,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Newest-first jobs from the hot table and the archive.
 
-def list_jobs(limit: int = 50) -> List[Dict[str, Any]]:
+    ``before_id`` returns older jobs, ``after_id`` the ``limit`` jobs right
+    after it (both keyset on id). ``fields`` limits the returned keys; ``id``
+    is always included and JSON columns that are not requested are never
+    read or decoded.
+    """
+    columns = _projection(fields, {"payload": "payload_json", "result": "result_json"}, virtual=("archived",))
+    clauses = []
+    values: List[Any] = []
+    if before_id is not None:
+        clauses.append("id < ?")
+        values.append(before_id)
+    if after_id is not None:
+        clauses.append("id > ?")
+        values.append(after_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    ascending = after_id is not None and before_id is None
+    order = "ASC" if ascending else "DESC"
+    jobs: List[Dict[str, Any]] = []
     with _connect() as conn:
-        rows = conn.execute(
-            "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?",
-            (limit,),
-        ).fetchall()
-    return [_job_from_row(row) for row in rows]
+        for table in ("jobs", "jobs_archive"):
+            rows = conn.execute(
+                f"SELECT {columns} FROM {table} {where} ORDER BY id {order} LIMIT ?",
+                [*values, limit],
+            ).fetchall()
+            for row in rows:
+                job = _job_from_row(row)
+                if table == "jobs_archive" and (not fields or "archived" in fields):
+                    job["archived"] = True
+                jobs.append(job)
+    jobs.sort(key=lambda job: job["id"], reverse=not ascending)
+    jobs = jobs[:limit]
+    if ascending:
+        jobs.reverse()
+    return jobs
 
 
 def list_jobs_by_status(status: str, limit: int = 20) -> List[Dict[str, Any]]:
@@ -245,44 +525,258 @@ def list_jobs_by_status(status: str, limit: int = 20) -> List[Dict[str, Any]]:
     return [_job_from_row(row) for row in rows]
 
 
+_JOB_REF_COLUMNS = "id, printer_id, priority, deadline, created_at"
+
+
+def list_job_refs(status: str) -> List[Dict[str, Any]]:
+    """Scheduling columns of every job in ``status``, oldest first.
+
+    JSON-free; used to hydrate the dispatcher's queues.
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT {_JOB_REF_COLUMNS} FROM jobs WHERE status = ? ORDER BY created_at ASC",
+            (status,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
 def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """Look up a job in the hot table, falling back to jobs_archive."""
     with _connect() as conn:
         row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row:
+            return _job_from_row(row)
+        row = conn.execute("SELECT * FROM jobs_archive WHERE id = ?", (job_id,)).fetchone()
+    if not row:
+        return None
+    job = _job_from_row(row)
+    job["archived"] = True
+    return job
+
+
+def find_job_by_idempotency_key(idempotency_key: str) -> Optional[Dict[str, Any]]:
+    """The job a repeated request would replay, if its key is still in the window."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=JOB_IDEMPOTENCY_WINDOW_S)).isoformat()
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE idempotency_key = ? AND created_at >= ?", (idempotency_key, cutoff)
+        ).fetchone()
     return _job_from_row(row) if row else None
 
 
-def create_job(printer_id: int, payload_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+JOB_FINAL_STATUSES = ("success", "failed", "expired")
+
+
+def archive_finished_jobs(older_than_days: float, batch_size: int = 500) -> int:
+    """Move finished jobs older than ``older_than_days`` to jobs_archive.
+
+    Runs in batches of ``batch_size`` rows, one short transaction each, so
+    the dispatcher is never blocked for long. Returns the number moved.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).isoformat()
+    placeholders = ", ".join("?" for _ in JOB_FINAL_STATUSES)
+    moved = 0
+    with _connect() as conn:
+        columns = ", ".join(name for name, _ in _table_columns(conn, "jobs"))
+        while True:
+            ids = [
+                row["id"]
+                for row in conn.execute(
+                    f"""
+                    SELECT id FROM jobs
+                    WHERE status IN ({placeholders}) AND created_at < ?
+                      AND COALESCE(finished_at, updated_at) < ?
+                    ORDER BY created_at ASC LIMIT ?
+                    """,
+                    (*JOB_FINAL_STATUSES, cutoff, cutoff, batch_size),
+                ).fetchall()
+            ]
+            if not ids:
+                break
+            id_list = ", ".join("?" for _ in ids)
+            conn.execute(
+                f"INSERT OR REPLACE INTO jobs_archive ({columns}) SELECT {columns} FROM jobs WHERE id IN ({id_list})",
+                ids,
+            )
+            conn.execute(f"DELETE FROM jobs WHERE id IN ({id_list})", ids)
+            conn.commit()
+            moved += len(ids)
+            if len(ids) < batch_size:
+                break
+    return moved
+
+
+# In-process "a job became queued" notification, so the dispatcher can start
+# it immediately instead of waiting for its next poll. Listeners receive the
+# job's scheduling columns (see _JOB_REF_COLUMNS), may be called from any
+# thread and must not block.
+_job_queued_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_job_queued_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener not in _job_queued_listeners:
+        _job_queued_listeners.append(listener)
+
+
+def remove_job_queued_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener in _job_queued_listeners:
+        _job_queued_listeners.remove(listener)
+
+
+def _notify_job_queued(job: Dict[str, Any]) -> None:
+    ref = {key: job.get(key) for key in ("id", "printer_id", "priority", "deadline", "created_at")}
+    for listener in list(_job_queued_listeners):
+        listener(ref)
+
+
+# In-process "a job changed status" notification (created, printing,
+# re-queued, success / failed / expired), so waiters learn about completion
+# without polling. Same rules as above. A new job is reported in full;
+# status transitions report only _JOB_STATUS_COLUMNS (no payload), so
+# a listener that needs the whole job re-reads it with get_job().
+# Jobs changed by another process are not reported here.
+_job_status_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_job_status_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener not in _job_status_listeners:
+        _job_status_listeners.append(listener)
+
+
+def remove_job_status_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener in _job_status_listeners:
+        _job_status_listeners.remove(listener)
+
+
+_JOB_STATUS_COLUMNS = (
+    "id", "printer_id", "payload_type", "status", "retries", "error", "result_json",
+    "created_at", "updated_at", "started_at", "finished_at",
+)
+
+
+def _notify_job_status(job: Dict[str, Any]) -> None:
+    for listener in list(_job_status_listeners):
+        listener(job)
+
+
+def _insert_job(
+    conn: sqlite3.Connection,
+    printer_id: int,
+    payload_type: str,
+    payload: Dict[str, Any],
+    priority: int = 0,
+    deadline: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    after_job_id: Optional[int] = None,
+) -> Tuple[Dict[str, Any], bool]:
+    """INSERT one queued job on ``conn`` (no commit). Returns (job, replayed)."""
     now = now_iso()
     payload_json = json.dumps(payload or {}, ensure_ascii=False)
+    if idempotency_key:
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=JOB_IDEMPOTENCY_WINDOW_S)).isoformat()
+        conn.execute(
+            "UPDATE jobs SET idempotency_key = NULL WHERE idempotency_key = ? AND created_at < ?",
+            (idempotency_key, cutoff),
+        )
+    row = conn.execute(
+        """
+        INSERT INTO jobs
+        (printer_id, payload_type, payload_json, status, retries, priority, deadline,
+         idempotency_key, after_job_id, created_at, updated_at)
+        VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+        RETURNING *
+        """,
+        (printer_id, payload_type, payload_json, priority, deadline, idempotency_key, after_job_id, now, now),
+    ).fetchone()
+    if row is None:
+        replay = conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        job = _job_from_row(replay)
+        job["idempotent_replay"] = True
+        return job, True
+    return _job_from_row(row), False
+
+
+def create_job(
+    printer_id: int,
+    payload_type: str,
+    payload: Dict[str, Any],
+    priority: int = 0,
+    deadline: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Insert a queued job.
+
+    With an ``idempotency_key`` a repeat submission within
+    JOB_IDEMPOTENCY_WINDOW_S returns the existing job (marked
+    ``idempotent_replay``) instead of inserting a new one; older keys are
+    released and may be reused.
+    """
     with _connect() as conn:
-        cur = conn.execute(
-            """
-            INSERT INTO jobs
-            (printer_id, payload_type, payload_json, status, retries, created_at, updated_at)
-            VALUES (?, ?, ?, 'queued', 0, ?, ?)
-            """,
-            (printer_id, payload_type, payload_json, now, now),
+        job, replayed = _insert_job(
+            conn, printer_id, payload_type, payload, priority, deadline, idempotency_key
         )
-        job_id = cur.lastrowid
         conn.commit()
-    return get_job(int(job_id))
+    if not replayed:
+        _notify_job_queued(job)
+        _notify_job_status(job)
+    return job
 
 
-def update_job(job_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    if not data:
-        return get_job(job_id)
+def create_jobs(items: Sequence[Dict[str, Any]], ordered: bool = False) -> List[Dict[str, Any]]:
+    """Insert several jobs in one transaction; returned in submission order.
+
+    Each item takes the ``create_job`` arguments as keys. With ``ordered``
+    every job after the first one for a printer gets ``after_job_id`` set to
+    its predecessor, and the dispatcher holds it back until that job is done
+    (whatever its priority, deadline or retries).
+    """
+    jobs: List[Dict[str, Any]] = []
+    previous: Dict[int, int] = {}
+    with _connect() as conn:
+        for item in items:
+            printer_id = int(item["printer_id"])
+            job, _ = _insert_job(
+                conn,
+                printer_id,
+                item["payload_type"],
+                item.get("payload") or {},
+                priority=int(item.get("priority") or 0),
+                deadline=item.get("deadline"),
+                idempotency_key=item.get("idempotency_key"),
+                after_job_id=previous.get(printer_id) if ordered else None,
+            )
+            previous[printer_id] = int(job["id"])
+            jobs.append(job)
+        conn.commit()
+    for job in jobs:
+        if not job.get("idempotent_replay"):
+            _notify_job_queued(job)
+            _notify_job_status(job)
+    return jobs
+
+
+_JOB_UPDATE_COLUMNS = {
+    "payload": "payload_json",
+    "result": "result_json",
+    "status": "status",
+    "retries": "retries",
+    "error": "error",
+    "started_at": "started_at",
+    "finished_at": "finished_at",
+    "owner": "owner",
+    "lease_expires_at": "lease_expires_at",
+    "heartbeat_at": "heartbeat_at",
+    "priority": "priority",
+    "deadline": "deadline",
+}
+
+
+def _job_assignments(data: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
     fields = []
     values: List[Any] = []
-    mapping = {
-        "payload": "payload_json",
-        "result": "result_json",
-        "status": "status",
-        "retries": "retries",
-        "error": "error",
-        "started_at": "started_at",
-        "finished_at": "finished_at",
-    }
-    for key, column in mapping.items():
+    for key, column in _JOB_UPDATE_COLUMNS.items():
         if key not in data:
             continue
         value = data[key]
@@ -290,33 +784,487 @@ def update_job(job_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
             value = json.dumps(value or {}, ensure_ascii=False) if value else None
         fields.append(f"{column} = ?")
         values.append(value)
+    if fields:
+        fields.append("updated_at = ?")
+        values.append(now_iso())
+    return fields, values
+
+
+def update_job(job_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Apply ``data`` and return the updated job in the same statement."""
+    fields, values = _job_assignments(data or {})
     if not fields:
         return get_job(job_id)
-    fields.append("updated_at = ?")
-    values.append(now_iso())
+    with _connect() as conn:
+        row = conn.execute(
+            f"UPDATE jobs SET {', '.join(fields)} WHERE id = ? RETURNING *",
+            [*values, job_id],
+        ).fetchone()
+        conn.commit()
+    if not row:
+        # Archived jobs are not in the hot table; report them unchanged.
+        return get_job(job_id)
+    job = _job_from_row(row)
+    if data.get("status") == "queued":
+        _notify_job_queued(job)
+    if "status" in data:
+        _notify_job_status(job)
+    return job
+
+
+def _transition_job(
+    job_id: int,
+    data: Dict[str, Any],
+    from_status: Optional[str] = None,
+    owner: Optional[str] = None,
+) -> bool:
+    """One UPDATE, no re-read. Returns whether a row was changed.
+
+    Status changes are reported to the job status listeners with the
+    ``_JOB_STATUS_COLUMNS`` returned by the same statement; without
+    listeners nothing is returned or decoded.
+
+    ``from_status`` / ``owner`` make the update conditional, so a process
+    only moves jobs that are still in the expected state and still its own.
+    """
+    fields, values = _job_assignments(data)
+    where = "id = ?"
     values.append(job_id)
-    query = f"UPDATE jobs SET {', '.join(fields)} WHERE id = ?"
+    if from_status is not None:
+        where += " AND status = ?"
+        values.append(from_status)
+    if owner is not None:
+        where += " AND owner = ?"
+        values.append(owner)
+    if "status" not in data or not _job_status_listeners:
+        with _connect() as conn:
+            changed = conn.execute(f"UPDATE jobs SET {', '.join(fields)} WHERE {where}", values).rowcount
+            conn.commit()
+        return changed > 0
+    returning = ", ".join(_JOB_STATUS_COLUMNS)
     with _connect() as conn:
-        conn.execute(query, values)
+        row = conn.execute(
+            f"UPDATE jobs SET {', '.join(fields)} WHERE {where} RETURNING {returning}", values
+        ).fetchone()
         conn.commit()
-    return get_job(job_id)
+    if row is None:
+        return False
+    _notify_job_status(_job_from_row(row))
+    return True
 
 
-def create_log(level: str, message: str, context: Optional[Dict[str, Any]] = None) -> None:
+def _lease_until(lease_seconds: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)).isoformat()
+
+
+def mark_printing(job_id: int, owner: Optional[str] = None, lease_seconds: Optional[float] = None) -> bool:
+    """Claim a queued job for printing.
+
+    The claim is a single conditional UPDATE, so when several gateway
+    processes share the database exactly one of them wins. False if the
+    job is no longer queued (cancelled, or claimed by someone else).
+    """
+    now = now_iso()
+    return _transition_job(
+        job_id,
+        {
+            "status": "printing",
+            "started_at": now,
+            "error": None,
+            "owner": owner,
+            "heartbeat_at": now,
+            "lease_expires_at": _lease_until(lease_seconds or JOB_LEASE_SECONDS),
+        },
+        from_status="queued",
+    )
+
+
+def heartbeat_job(job_id: int, owner: str, lease_seconds: Optional[float] = None) -> bool:
+    """Extend the lease on a job we are printing. False if the lease was lost."""
+    return _transition_job(
+        job_id,
+        {"heartbeat_at": now_iso(), "lease_expires_at": _lease_until(lease_seconds or JOB_LEASE_SECONDS)},
+        from_status="printing",
+        owner=owner,
+    )
+
+
+def mark_success(job_id: int, result: Optional[Dict[str, Any]] = None, owner: Optional[str] = None) -> bool:
+    return _transition_job(
+        job_id,
+        {
+            "status": "success",
+            "finished_at": now_iso(),
+            "error": None,
+            "result": result,
+            "lease_expires_at": None,
+        },
+        owner=owner,
+    )
+
+
+def mark_failed(
+    job_id: int,
+    error: str,
+    retries: Optional[int] = None,
+    owner: Optional[str] = None,
+    from_status: Optional[str] = None,
+    result: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """``from_status="queued"`` fails a job that was never claimed (no owner to check)."""
+    data: Dict[str, Any] = {
+        "status": "failed",
+        "error": error,
+        "finished_at": now_iso(),
+        "lease_expires_at": None,
+    }
+    if retries is not None:
+        data["retries"] = retries
+    if result is not None:
+        data["result"] = result
+    return _transition_job(job_id, data, owner=owner, from_status=from_status)
+
+
+def mark_expired(job_id: int, result: Optional[Dict[str, Any]] = None) -> bool:
+    """A queued job whose deadline passed before it could start."""
+    return _transition_job(
+        job_id,
+        {
+            "status": "expired",
+            "error": "Deadline passed while queued",
+            "finished_at": now_iso(),
+            "result": result,
+        },
+        from_status="queued",
+    )
+
+
+def mark_requeued(job_id: int, error: str, retries: int, owner: Optional[str] = None) -> bool:
+    """Put a failed attempt back in the queue for another try."""
+    return _transition_job(
+        job_id,
+        {
+            "status": "queued",
+            "retries": retries,
+            "error": error,
+            "started_at": None,
+            "owner": None,
+            "lease_expires_at": None,
+        },
+        owner=owner,
+    )
+
+
+def requeue_expired_jobs(max_retries: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Release jobs whose owner stopped heartbeating (e.g. a crashed process).
+
+    An expired lease counts as a failed attempt: the job goes back to the
+    queue, or to failed once ``max_retries`` is used up. Printing jobs from
+    before leases existed are treated as expired once idle for a full lease.
+    Returns the re-queued jobs and the number failed.
+    """
     now = now_iso()
-    context_json = json.dumps(context, ensure_ascii=False) if context else None
+    stale_before = (datetime.now(timezone.utc) - timedelta(seconds=JOB_LEASE_SECONDS)).isoformat()
+    expired = """
+        status = 'printing'
+        AND (lease_expires_at < ? OR (lease_expires_at IS NULL AND updated_at < ?))
+    """
     with _connect() as conn:
-        conn.execute(
-            "INSERT INTO logs (level, message, context_json, created_at) VALUES (?, ?, ?, ?)",
-            (level, message, context_json, now),
+        failed_rows = conn.execute(
+            f"""
+            UPDATE jobs SET status = 'failed', retries = retries + 1,
+                error = 'Lease expired (owner ' || COALESCE(owner, '?') || ')',
+                finished_at = ?, lease_expires_at = NULL, updated_at = ?
+            WHERE {expired} AND retries >= ?
+            RETURNING *
+            """,
+            (now, now, now, stale_before, max_retries),
+        ).fetchall()
+        rows = conn.execute(
+            f"""
+            UPDATE jobs SET status = 'queued', retries = retries + 1,
+                error = 'Lease expired (owner ' || COALESCE(owner, '?') || ')',
+                started_at = NULL, owner = NULL, lease_expires_at = NULL, updated_at = ?
+            WHERE {expired}
+            RETURNING *
+            """,
+            (now, now, stale_before),
+        ).fetchall()
+        conn.commit()
+    requeued = [_job_from_row(row) for row in rows]
+    for job in requeued:
+        _notify_job_queued(job)
+        _notify_job_status(job)
+    for row in failed_rows:
+        _notify_job_status(_job_from_row(row))
+    return requeued, len(failed_rows)
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _log_columns(context: Optional[Dict[str, Any]]) -> tuple:
+    """Indexed columns lifted from the log context: (correlation_id, printer_id, job_id)."""
+    if not context:
+        return None, None, None
+    correlation_id = context.get("correlation_id")
+    return (
+        str(correlation_id) if correlation_id else None,
+        _int_or_none(context.get("printer_id")),
+        _int_or_none(context.get("job_id")),
+    )
+
+
+# ── Log partitions ───────────────────────────────────────────────
+# Every (level, UTC day) pair gets its own table, e.g. ``logs_info_20261017``,
+# so retention is enforced per level by dropping whole tables instead of
+# row-by-row DELETE. Freed pages are reused by new partitions, so the file
+# stays bounded without a manual VACUUM.
+#
+# Ids stay unique across partitions: each table's AUTOINCREMENT sequence is
+# seeded at (day_index * 8 + level_slot) * _LOG_ID_SPAN.
+_LEGACY_LOG_TABLE = "logs"
+_LOG_PARTITION_RE = re.compile(r"^logs_([a-z]+)_(\d{8})$")
+_LOG_LEVEL_SLOTS = {"trace": 0, "debug": 1, "info": 2, "warning": 3, "error": 4}
+_LOG_ID_SPAN = 10 ** 8
+_EPOCH = date(1970, 1, 1)
+_known_log_partitions: set[str] = set()
+_log_partitions_lock = threading.Lock()
+
+
+def _create_log_indexes(conn: sqlite3.Connection, table: str) -> None:
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table} (created_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_correlation_id ON {table} (correlation_id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_printer_created ON {table} (printer_id, created_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_job_id ON {table} (job_id)")
+
+
+def _log_partition_name(level: str, created_at: str) -> str:
+    level_key = re.sub(r"[^a-z]", "", level.lower()) or "info"
+    return f"logs_{level_key}_{created_at[:10].replace('-', '')}"
+
+
+def _ensure_log_partition(conn: sqlite3.Connection, name: str) -> None:
+    if name in _known_log_partitions:
+        return
+    match = _LOG_PARTITION_RE.match(name)
+    if not match:
+        raise ValueError(f"Invalid log partition name: {name}")
+    level, day = match.groups()
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            context_json TEXT,
+            created_at TEXT NOT NULL,
+            correlation_id TEXT,
+            printer_id INTEGER,
+            job_id INTEGER
         )
+        """
+    )
+    _create_log_indexes(conn, name)
+    day_index = (date(int(day[:4]), int(day[4:6]), int(day[6:])) - _EPOCH).days
+    id_base = (day_index * 8 + _LOG_LEVEL_SLOTS.get(level, 7)) * _LOG_ID_SPAN
+    conn.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+        (name, id_base, name),
+    )
+    with _log_partitions_lock:
+        _known_log_partitions.add(name)
+
+
+def _log_partitions(conn: sqlite3.Connection) -> List[Tuple[str, str, str]]:
+    """Return (table, level, YYYYMMDD) for every existing log partition."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'logs_%'"
+    ).fetchall()
+    partitions = []
+    for row in rows:
+        match = _LOG_PARTITION_RE.match(row["name"])
+        if match:
+            partitions.append((row["name"], match.group(1), match.group(2)))
+    return partitions
+
+
+def create_log(level: str, message: str, context: Optional[Dict[str, Any]] = None) -> None:
+    create_logs([{"level": level, "message": message, "context": context, "created_at": now_iso()}])
+
+
+def create_logs(entries: Iterable[Dict[str, Any]]) -> int:
+    """Insert a batch of log entries in a single transaction.
+
+    Each entry carries ``level``, ``message``, ``context`` and ``created_at``
+    (captured by the caller at log time, not at flush time). Entries are
+    routed to their (level, day) partition.
+    """
+    by_partition: Dict[str, List[tuple]] = {}
+    count = 0
+    for entry in entries:
+        created_at = entry.get("created_at") or now_iso()
+        row = (
+            entry["level"],
+            entry["message"],
+            json.dumps(entry["context"], ensure_ascii=False, default=str) if entry.get("context") else None,
+            created_at,
+            *_log_columns(entry.get("context")),
+        )
+        by_partition.setdefault(_log_partition_name(entry["level"], created_at), []).append(row)
+        count += 1
+    if not count:
+        return 0
+    with _connect() as conn:
+        for name, rows in by_partition.items():
+            _ensure_log_partition(conn, name)
+            conn.executemany(
+                f"INSERT INTO {name} (level, message, context_json, created_at, correlation_id, printer_id, job_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
         conn.commit()
+    return count
+
 
+def _log_cursor(conn: sqlite3.Connection, log_id: int) -> Tuple[str, int]:
+    """Resolve a log id to its (created_at, id) sort key."""
+    if log_id < _LOG_ID_SPAN:
+        tables = [_LEGACY_LOG_TABLE] if _table_exists(conn, _LEGACY_LOG_TABLE) else []
+    else:
+        day = (_EPOCH + timedelta(days=log_id // _LOG_ID_SPAN // 8)).strftime("%Y%m%d")
+        tables = [name for name, _, table_day in _log_partitions(conn) if table_day == day]
+    for table in tables:
+        row = conn.execute(f"SELECT created_at FROM {table} WHERE id = ?", (log_id,)).fetchone()
+        if row:
+            return row["created_at"], log_id
+    raise ValueError(f"Unknown log id: {log_id}")
 
-def list_logs(limit: int = 200) -> List[Dict[str, Any]]:
+
+def list_logs(
+    limit: int = 200,
+    correlation_id: Optional[str] = None,
+    printer_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+    levels: Optional[List[str]] = None,
+    since: Optional[str] = None,
+    message_prefix: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Newest-first logs across all partitions.
+
+    Partitions are read one day at a time, newest first, and reading stops
+    as soon as ``limit`` rows are collected; ``levels`` and ``since`` prune
+    whole partitions before any table is touched.
+
+    ``before_id`` / ``after_id`` page relative to an existing log entry
+    (keyset on created_at, id): older entries, or the ``limit`` entries
+    right after it. ``fields`` limits the returned keys (``id`` and
+    ``created_at`` are always included). ``since`` must be a UTC ISO
+    timestamp like the stored ``created_at``.
+    """
+    columns = _projection(fields, {"context": "context_json"}, always=("id", "created_at"))
+    clauses = []
+    values: List[Any] = []
+    if correlation_id:
+        clauses.append("correlation_id = ?")
+        values.append(correlation_id)
+    if printer_id is not None:
+        clauses.append("printer_id = ?")
+        values.append(printer_id)
+    if job_id is not None:
+        clauses.append("job_id = ?")
+        values.append(job_id)
+    if since:
+        clauses.append("created_at >= ?")
+        values.append(since)
+    if message_prefix:
+        clauses.append("substr(message, 1, ?) = ?")
+        values.extend([len(message_prefix), message_prefix])
+    since_day = since[:10].replace("-", "") if since else None
+    ascending = after_id is not None and before_id is None
+    order = "ASC" if ascending else "DESC"
+
+    rows: List[sqlite3.Row] = []
     with _connect() as conn:
-        rows = conn.execute(
-            "SELECT * FROM logs ORDER BY created_at DESC LIMIT ?",
-            (limit,),
-        ).fetchall()
+        min_day = since_day
+        max_day = None
+        for cursor_id, op in ((before_id, "<"), (after_id, ">")):
+            if cursor_id is None:
+                continue
+            created_at, cursor_id = _log_cursor(conn, cursor_id)
+            clauses.append(f"(created_at {op} ? OR (created_at = ? AND id {op} ?))")
+            values.extend([created_at, created_at, cursor_id])
+            cursor_day = created_at[:10].replace("-", "")
+            if op == "<":
+                max_day = cursor_day
+            else:
+                min_day = max(min_day or cursor_day, cursor_day)
+        legacy_clauses = list(clauses)
+        legacy_values = list(values)
+        if levels:
+            legacy_clauses.append(f"level IN ({', '.join('?' for _ in levels)})")
+            legacy_values.extend(levels)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        legacy_where = f"WHERE {' AND '.join(legacy_clauses)}" if legacy_clauses else ""
+
+        days: Dict[str, List[str]] = {}
+        for name, level, day in _log_partitions(conn):
+            if levels and level not in levels:
+                continue
+            if (min_day and day < min_day) or (max_day and day > max_day):
+                continue
+            days.setdefault(day, []).append(name)
+        sources = [(tables, where, values) for _, tables in sorted(days.items(), reverse=True)]
+        if _table_exists(conn, _LEGACY_LOG_TABLE):
+            sources.append(([_LEGACY_LOG_TABLE], legacy_where, legacy_values))
+        if ascending:
+            sources.reverse()
+        for tables, source_where, source_values in sources:
+            remaining = limit - len(rows)
+            if remaining <= 0:
+                break
+            union = " UNION ALL ".join(f"SELECT {columns} FROM {table} {source_where}" for table in tables)
+            rows.extend(
+                conn.execute(
+                    f"SELECT * FROM ({union}) ORDER BY created_at {order}, id {order} LIMIT ?",
+                    [*source_values * len(tables), remaining],
+                ).fetchall()
+            )
+    if ascending:
+        rows.reverse()
     return [_log_from_row(row) for row in rows]
+
+
+def purge_expired_logs(retention_days: Optional[Dict[str, int]] = None) -> List[str]:
+    """Drop log partitions older than their level's retention. Returns dropped tables."""
+    retention = retention_days or LOG_RETENTION_DAYS
+    default_days = retention.get("default", max(retention.values(), default=30))
+    today = datetime.now(timezone.utc).date()
+    dropped: List[str] = []
+    with _connect() as conn:
+        for name, level, day in _log_partitions(conn):
+            keep_days = max(1, int(retention.get(level, default_days)))
+            cutoff = (today - timedelta(days=keep_days)).strftime("%Y%m%d")
+            if day < cutoff:
+                conn.execute(f"DROP TABLE IF EXISTS {name}")
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+                dropped.append(name)
+        if _table_exists(conn, _LEGACY_LOG_TABLE):
+            newest = conn.execute(f"SELECT MAX(created_at) FROM {_LEGACY_LOG_TABLE}").fetchone()[0]
+            longest = max([default_days, *retention.values()])
+            cutoff_iso = (today - timedelta(days=longest)).isoformat()
+            if newest is None or newest < cutoff_iso:
+                conn.execute(f"DROP TABLE IF EXISTS {_LEGACY_LOG_TABLE}")
+                dropped.append(_LEGACY_LOG_TABLE)
+        conn.commit()
+    with _log_partitions_lock:
+        _known_log_partitions.difference_update(dropped)
+    return dropped
@@ -0,0 +1,284 @@
+"""Dedicated thread executors for blocking device I/O.
+
+Serial / TCP / pinpad calls are blocking and can take minutes (pinpad
+end-of-day). Running them on the default ``asyncio.to_thread`` pool lets a
+few slow devices exhaust it and stall every other printer, so each printer
+gets its own single-thread executor instead: calls to one device run in
+order, and a hung device only delays its own queue. Detection on ports not
+yet tied to a printer uses a small shared "tools" pool.
+
+``stats()`` reports per-executor saturation: calls waiting for the thread,
+the one running, and how long calls waited to start.
+
+``DeviceQueryCache`` sits in front of read-only queries (status, datetime,
+pinpad info): concurrent identical queries for one printer share a single
+device call, and a result is reused for ``DEVICE_QUERY_TTL_S``.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from app.app_logging import log_warning
+from app.cancellation import CancelToken
+from app.metrics import DEVICE_QUERIES, GaugeFamily, metrics
+from app.settings import DEVICE_QUERY_TTL_S, DEVICE_TOOL_WORKERS
+
+T = TypeVar("T")
+
+TOOLS = "tools"
+
+
+class _ExecutorStats:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_s = 0.0
+        self.last_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "running": self.running,
+            "saturated": self.running >= self.workers and self.queued > 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "busy_s": round(self.busy_s, 3),
+            "last_wait_ms": round(self.last_wait_ms, 1),
+            "max_wait_ms": round(self.max_wait_ms, 1),
+        }
+
+
+class DeviceExecutors:
+    """Per-printer single-thread executors plus a shared tools pool."""
+
+    def __init__(self, tool_workers: int = DEVICE_TOOL_WORKERS) -> None:
+        self._tool_workers = max(1, tool_workers)
+        self._executors: Dict[Any, ThreadPoolExecutor] = {}
+        self._stats: Dict[Any, _ExecutorStats] = {}
+        self._lock = threading.Lock()
+
+    async def run(self, printer_id: int, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``func`` on the printer's own I/O thread."""
+        return await self._submit(int(printer_id), func, *args, **kwargs)
+
+    async def run_cancellable(
+        self,
+        printer_id: int,
+        timeout_s: float,
+        func: Callable[..., T],
+        *args: Any,
+        grace_s: float = 5.0,
+        **kwargs: Any,
+    ) -> T:
+        """Run ``func(..., cancel_token=token)`` on the printer's thread with a timeout.
+
+        The timeout starts when the call starts running: time spent queued
+        behind other calls on the printer's thread is not the device's fault
+        and must not trip the circuit breaker.
+
+        On timeout (or if the caller is cancelled) the token is set and the
+        call gets ``grace_s`` to stop at its next frame and close the
+        transport before ``asyncio.TimeoutError`` is raised, so whoever takes
+        the printer next does not collide with it.
+        """
+        token = CancelToken()
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def begin(*call_args: Any, **call_kwargs: Any) -> T:
+            loop.call_soon_threadsafe(started.set)
+            return func(*call_args, **call_kwargs)
+
+        future = asyncio.ensure_future(self.run(printer_id, begin, *args, cancel_token=token, **kwargs))
+        # After a timeout nobody awaits the outcome; mark it retrieved.
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        try:
+            waiter = asyncio.ensure_future(started.wait())
+            try:
+                await asyncio.wait({future, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            token.cancel(f"timed out after {timeout_s}s")
+            done, _ = await asyncio.wait({future}, timeout=grace_s)
+            if not done:
+                log_warning(
+                    "DEVICE_CANCEL_OVERRUN",
+                    {"printer_id": printer_id, "func": getattr(func, "__name__", str(func)), "grace_s": grace_s},
+                )
+            raise
+
+    async def run_tool(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``func`` on the shared pool (detection of unassigned ports)."""
+        return await self._submit(TOOLS, func, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            executors = {str(key): stats.snapshot() for key, stats in self._stats.items()}
+        return {
+            "executors": executors,
+            "queued": sum(item["queued"] for item in executors.values()),
+            "running": sum(item["running"] for item in executors.values()),
+            "saturated": sorted(key for key, item in executors.items() if item["saturated"]),
+        }
+
+    def collect_metrics(self) -> List[GaugeFamily]:
+        executors = sorted(self.stats()["executors"].items())
+        return [
+            ("device_io_queued", "gauge", "Device calls waiting for the executor thread",
+             [({"executor": key}, item["queued"]) for key, item in executors]),
+            ("device_io_running", "gauge", "Device calls running",
+             [({"executor": key}, item["running"]) for key, item in executors]),
+        ]
+
+    def discard(self, printer_id: int) -> None:
+        """Drop a deleted printer's executor once its pending calls finish."""
+        with self._lock:
+            executor = self._executors.pop(int(printer_id), None)
+            self._stats.pop(int(printer_id), None)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _executor(self, key: Any) -> tuple[ThreadPoolExecutor, _ExecutorStats]:
+        with self._lock:
+            executor = self._executors.get(key)
+            if executor is None:
+                workers = self._tool_workers if key == TOOLS else 1
+                executor = self._executors[key] = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix=f"device-{key}"
+                )
+                self._stats[key] = _ExecutorStats(workers)
+            return executor, self._stats[key]
+
+    async def _submit(self, key: Any, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        executor, stats = self._executor(key)
+        submitted = time.monotonic()
+        # Same context propagation as asyncio.to_thread (trace scope etc.).
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+        def tracked() -> T:
+            started = time.monotonic()
+            wait_ms = (started - submitted) * 1000
+            with self._lock:
+                stats.queued -= 1
+                stats.running += 1
+                stats.last_wait_ms = wait_ms
+                stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+            ok = False
+            try:
+                result = call()
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    stats.running -= 1
+                    stats.busy_s += time.monotonic() - started
+                    if ok:
+                        stats.completed += 1
+                    else:
+                        stats.failed += 1
+
+        with self._lock:
+            stats.queued += 1
+        try:
+            pending = executor.submit(tracked)
+        except RuntimeError:
+            with self._lock:
+                stats.queued -= 1
+            raise
+        try:
+            return await asyncio.wrap_future(pending)
+        except asyncio.CancelledError:
+            # Timed out before the thread picked it up: it will never run.
+            if pending.cancel():
+                with self._lock:
+                    stats.queued -= 1
+            raise
+
+
+class DeviceQueryCache:
+    """Single-flight plus short TTL for read-only device queries (event loop only).
+
+    Failures are shared with the callers already waiting but never cached.
+    """
+
+    def __init__(self, ttl_s: float = DEVICE_QUERY_TTL_S) -> None:
+        self.ttl_s = max(0.0, ttl_s)
+        self._inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._results: Dict[Tuple[int, str], Tuple[float, Any]] = {}
+
+    async def get(
+        self, printer_id: int, query: str, load: Callable[[], Awaitable[T]], fresh: bool = False
+    ) -> T:
+        """``await load()`` unless an identical query is running or fresh enough."""
+        key = (int(printer_id), query)
+        if not fresh:
+            cached = self._results.get(key)
+            if cached is not None and time.monotonic() < cached[0]:
+                DEVICE_QUERIES.labels(query, "hit").inc()
+                return cached[1]
+        future = self._inflight.get(key)
+        if future is not None:
+            DEVICE_QUERIES.labels(query, "coalesced").inc()
+        else:
+            DEVICE_QUERIES.labels(query, "miss").inc()
+            future = self._inflight[key] = asyncio.ensure_future(load())
+            future.add_done_callback(lambda done: self._finish(key, done))
+        # A waiter that goes away (client disconnect) leaves the call running
+        # for the others.
+        return await asyncio.shield(future)
+
+    def invalidate(self, printer_id: int, query: Optional[str] = None) -> None:
+        """Forget cached results for a printer (after a write or config change).
+
+        Queries still running are detached: their callers get the result,
+        but it is not cached and new callers start a fresh query.
+        """
+        for store in (self._results, self._inflight):
+            for key in list(store):
+                if key[0] == int(printer_id) and (query is None or key[1] == query):
+                    del store[key]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "ttl_s": self.ttl_s,
+            "inflight": sorted(f"{printer_id}:{query}" for printer_id, query in self._inflight),
+            "cached": sorted(
+                f"{printer_id}:{query}" for (printer_id, query), (expires, _) in self._results.items() if expires > now
+            ),
+        }
+
+    def _finish(self, key: Tuple[int, str], future: asyncio.Future) -> None:
+        if self._inflight.get(key) is not future:
+            # Detached by invalidate().
+            return
+        del self._inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        if self.ttl_s > 0:
+            self._results[key] = (time.monotonic() + self.ttl_s, future.result())
+
+
+device_executors = DeviceExecutors()
+metrics.add_collector(device_executors.collect_metrics)
+device_queries = DeviceQueryCache()
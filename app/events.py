@@ -0,0 +1,171 @@
+"""Live event hub behind ``GET /api/events`` (server-sent events).
+
+Producers call ``event_hub.publish(kind, data)`` from any thread:
+
+  job             — job status changes (app.db job status listeners)
+  log             — new log records (the "events" log sink)
+  printer         — printer created / updated / deleted
+  printer_status  — circuit breaker transitions and status checks
+  mqtt            — MQTT connection changes and received messages
+
+Every event gets an id ``<boot>-<seq>``. The last ``EVENTS_BUFFER_SIZE``
+events are kept, so a client reconnecting with ``Last-Event-ID`` gets what
+it missed. If that id is from a previous run or already out of the
+buffer, the client gets a ``resync`` event and should re-fetch its lists.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.db import add_job_status_listener, remove_job_status_listener
+from app.settings import EVENTS_BUFFER_SIZE, EVENTS_CLIENT_QUEUE
+
+EVENT_KINDS = ("job", "log", "printer", "printer_status", "mqtt")
+
+
+class Subscriber:
+    def __init__(
+        self, kinds: Optional[set[str]], max_queue: int, log_levels: Optional[set[str]] = None
+    ) -> None:
+        self.kinds = kinds
+        self.log_levels = log_levels
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # Set when the client fell too far behind; its stream then ends
+        # and the browser reconnects with its Last-Event-ID.
+        self.overflowed = False
+        # Set on server shutdown; the stream ends without draining the queue.
+        self.closed = False
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        if self.kinds is not None and event["event"] not in self.kinds:
+            return False
+        if event["event"] == "log" and self.log_levels is not None:
+            return event["data"]["level"] in self.log_levels
+        return True
+
+
+class EventHub:
+    def __init__(self, buffer_size: int = EVENTS_BUFFER_SIZE, client_queue: int = EVENTS_CLIENT_QUEUE) -> None:
+        self.boot = format(int(time.time()), "x")
+        self._seq = 0
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max(1, buffer_size))
+        self._client_queue = max(1, client_queue)
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.closing = False
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.closing = False
+        add_job_status_listener(self._on_job_status)
+
+    def close(self) -> None:
+        """End all open streams (safe from a signal handler or any thread).
+
+        uvicorn runs lifespan shutdown only after every connection has
+        closed, so this must be called when the exit signal arrives, not
+        from ``stop()``; otherwise a connected browser keeps the process up.
+        """
+        self.closing = True
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._close_subscribers)
+
+    def stop(self) -> None:
+        remove_job_status_listener(self._on_job_status)
+        self.closing = True
+        self._close_subscribers()
+        self._loop = None
+
+    def publish(self, kind: str, data: Any) -> None:
+        """Record an event and hand it to the connected clients (thread-safe)."""
+        with self._lock:
+            self._seq += 1
+            event = {"id": f"{self.boot}-{self._seq}", "seq": self._seq, "event": kind, "data": data}
+            self._buffer.append(event)
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fan_out(event)
+        else:
+            loop.call_soon_threadsafe(self._fan_out, event)
+
+    def subscribe(
+        self,
+        kinds: Optional[set[str]] = None,
+        last_event_id: Optional[str] = None,
+        log_levels: Optional[set[str]] = None,
+    ) -> Tuple[Subscriber, List[Dict[str, Any]], bool]:
+        """Register a client (event loop only).
+
+        Returns the subscriber, the buffered events after ``last_event_id``
+        and whether the client must resync (id unknown or too old).
+        """
+        subscriber = Subscriber(kinds, self._client_queue, log_levels)
+        if self.closing:
+            subscriber.closed = True
+            return subscriber, [], False
+        with self._lock:
+            replay, resync = self._replay_after(last_event_id)
+            # Registered under the lock: nothing published in between is lost.
+            self._subscribers.add(subscriber)
+        return subscriber, [event for event in replay if subscriber.wants(event)], resync
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._subscribers),
+            "last_event_id": f"{self.boot}-{self._seq}",
+            "buffered": len(self._buffer),
+        }
+
+    def _replay_after(self, last_event_id: Optional[str]) -> Tuple[List[Dict[str, Any]], bool]:
+        if not last_event_id:
+            return [], False
+        boot, _, seq = last_event_id.partition("-")
+        if boot != self.boot or not seq.isdigit():
+            return [], True
+        seq_no = int(seq)
+        if seq_no >= self._seq:
+            return [], False
+        if not self._buffer or self._buffer[0]["seq"] > seq_no + 1:
+            return [], True
+        return [event for event in self._buffer if event["seq"] > seq_no], False
+
+    def _on_job_status(self, job: Dict[str, Any]) -> None:
+        self.publish("job", job)
+
+    def _close_subscribers(self) -> None:
+        for subscriber in list(self._subscribers):
+            subscriber.closed = True
+            try:
+                # Wakes a stream waiting for its next event.
+                subscriber.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+        self._subscribers.clear()
+
+    def _fan_out(self, event: Dict[str, Any]) -> None:
+        for subscriber in list(self._subscribers):
+            if subscriber.overflowed or not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self._subscribers.discard(subscriber)
+
+
+event_hub = EventHub()
@@ -0,0 +1,103 @@
+"""Await job completion without polling.
+
+``JobCompletionBus`` listens to app.db's job status notifications and
+resolves per-job futures when a job reaches a final status (success,
+failed, expired). Waiters (MQTT result publishing, ``POST /api/jobs?wait=``)
+``await bus.wait(job_id, timeout)``.
+
+Status changes made by another gateway process sharing the database are
+not notified in-process, so a waiter also re-reads the job every
+``JOB_WAIT_FALLBACK_S`` seconds.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.db import (
+    JOB_FINAL_STATUSES,
+    add_job_status_listener,
+    get_job,
+    remove_job_status_listener,
+)
+from app.settings import JOB_WAIT_FALLBACK_S
+
+
+def is_final(job: Optional[Dict[str, Any]]) -> bool:
+    return bool(job) and job["status"] in JOB_FINAL_STATUSES
+
+
+class JobCompletionBus:
+    def __init__(self, fallback_s: float = JOB_WAIT_FALLBACK_S) -> None:
+        self.fallback_s = max(0.1, fallback_s)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        add_job_status_listener(self._on_job_status)
+
+    def stop(self) -> None:
+        remove_job_status_listener(self._on_job_status)
+        for waiters in self._waiters.values():
+            for future in waiters:
+                if not future.done():
+                    future.cancel()
+        self._waiters.clear()
+
+    def pending(self) -> int:
+        """Number of jobs somebody is waiting for."""
+        return len(self._waiters)
+
+    async def wait(self, job_id: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once final, or its latest state when ``timeout`` expires.
+
+        None if the job does not exist.
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        # Register before reading, so a completion in between is not missed.
+        self._waiters.setdefault(job_id, []).append(future)
+        try:
+            job = await asyncio.to_thread(get_job, job_id)
+            deadline = loop.time() + timeout
+            while job is not None and not is_final(job):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout=min(remaining, self.fallback_s))
+                except asyncio.TimeoutError:
+                    job = await asyncio.to_thread(get_job, job_id)
+                    continue
+                # Status notifications carry no payload: re-read the whole job.
+                return await asyncio.to_thread(get_job, job_id)
+            return job
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    def _on_job_status(self, job: Dict[str, Any]) -> None:
+        # Called from request threads, device threads and the event loop.
+        if not is_final(job) or int(job["id"]) not in self._waiters:
+            return
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._resolve(job)
+        else:
+            loop.call_soon_threadsafe(self._resolve, job)
+
+    def _resolve(self, job: Dict[str, Any]) -> None:
+        for future in self._waiters.get(int(job["id"]), []):
+            if not future.done():
+                future.set_result(job)
@@ -1,31 +1,272 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, Optional
+import heapq
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
-from app.db import get_printer, list_jobs_by_status, now_iso, update_job
-from app.app_logging import log_error, log_info
-from app.printer_service import send_payload
-from app.settings import JOB_MAX_RETRIES, JOB_POLL_INTERVAL, JOB_TIMEOUT_SECONDS
+from app.db import (
+    add_job_queued_listener,
+    add_job_status_listener,
+    archive_finished_jobs,
+    get_job,
+    get_printer,
+    heartbeat_job,
+    list_job_refs,
+    list_printers,
+    mark_expired,
+    mark_failed,
+    mark_printing,
+    mark_requeued,
+    mark_success,
+    remove_job_queued_listener,
+    remove_job_status_listener,
+    requeue_expired_jobs,
+)
+from app.admission import AdmissionController
+from app.app_logging import flush_logs, log_error, log_info
+from app.circuit_breaker import CircuitBreaker, is_transport_failure
+from app.device_io import device_executors
+from app.events import event_hub
+from app.job_bus import JobCompletionBus
+from app.metrics import JOB_DURATION, JOB_QUEUE_WAIT, JOB_RETRIES, JOBS, GaugeFamily, metrics
+from app.printer_service import probe_printer, send_payload
+from app.settings import (
+    BREAKER_PROBE_TIMEOUT_S,
+    JOB_ARCHIVE_AFTER_DAYS,
+    JOB_ARCHIVE_BATCH,
+    JOB_ARCHIVE_INTERVAL_S,
+    JOB_DEFAULT_PRIORITIES,
+    JOB_HEARTBEAT_SECONDS,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_RETRIES,
+    JOB_POLL_INTERVAL,
+    JOB_TIMEOUT_SECONDS,
+)
+from app.trace import flight_recorder
+
+
+def default_priority(payload_type: str) -> int:
+    return JOB_DEFAULT_PRIORITIES.get(payload_type, 0)
+
+
+def normalize_deadline(value: Any) -> Optional[str]:
+    """UTC ISO string for a datetime / ISO string deadline (naive = UTC)."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def _queue_wait_ms(job: Dict[str, Any]) -> int:
+    """Time since the job was created, in ms (includes earlier attempts)."""
+    created = datetime.fromisoformat(job["created_at"])
+    return int((datetime.now(timezone.utc) - created).total_seconds() * 1000)
+
+
+def _count_job_status(job: Dict[str, Any]) -> None:
+    JOBS.labels(job["printer_id"], job["status"]).inc()
+
+
+def _cancel_grace_s(printer: Dict[str, Any]) -> float:
+    """How long a cancelled device call may take to stop: one frame timeout."""
+    return int(printer.get("timeout_ms", 5000)) / 1000 + 1.0
+
+
+class PrinterLane:
+    """In-memory queue of job ids for one printer, consumed by one worker.
+
+    Jobs are ordered by ``sort_key``: highest priority first, then earliest
+    deadline (jobs without one last), then FIFO. ``queued`` mirrors the heap
+    for O(1) membership checks. Jobs from an ordered batch whose predecessor
+    (``after_job_id``) is not done yet are parked until it finishes;
+    ``parked_ids`` mirrors them, so the poll does not queue them twice.
+    """
+
+    def __init__(self, printer_id: int) -> None:
+        self.printer_id = printer_id
+        self.heap: List[Tuple[Any, int]] = []
+        self.queued: set[int] = set()
+        self.parked: dict[int, List[Dict[str, Any]]] = {}
+        self.parked_ids: set[int] = set()
+        self.active_job: Optional[int] = None
+        self.breaker = CircuitBreaker(printer_id)
+        self.has_work = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+
+    def push(self, job: Dict[str, Any]) -> bool:
+        """Queue a job ref (id, priority, deadline). False if already queued or parked."""
+        job_id = int(job["id"])
+        if job_id in self.queued or job_id in self.parked_ids:
+            return False
+        heapq.heappush(self.heap, (self.sort_key(job), job_id))
+        self.queued.add(job_id)
+        self.has_work.set()
+        return True
+
+    def pop(self) -> Optional[int]:
+        if not self.heap:
+            self.has_work.clear()
+            return None
+        _, job_id = heapq.heappop(self.heap)
+        self.queued.discard(job_id)
+        return job_id
+
+    def park(self, after_job_id: int, job: Dict[str, Any]) -> None:
+        waiting = self.parked.setdefault(after_job_id, [])
+        if all(ref["id"] != job["id"] for ref in waiting):
+            waiting.append({key: job.get(key) for key in ("id", "priority", "deadline")})
+            self.parked_ids.add(int(job["id"]))
+
+    def release(self, job_id: int) -> None:
+        """Re-queue the jobs that were waiting for ``job_id``."""
+        for ref in self.parked.pop(job_id, []):
+            self.parked_ids.discard(int(ref["id"]))
+            self.push(ref)
+
+    @staticmethod
+    def sort_key(job: Dict[str, Any]) -> Any:
+        return (-int(job.get("priority") or 0), job.get("deadline") or "~", int(job["id"]))
 
 
 class JobQueue:
+    """Dispatches queued jobs to printers.
+
+    Every printer gets a lane: an in-memory queue hydrated from the
+    database at startup and a long-lived worker that prints its jobs one at
+    a time, so a backlog on one printer never delays another. New and
+    re-queued jobs are pushed to their lane as they are created (hooked into
+    app.db); the ``JOB_POLL_INTERVAL`` poll only reconciles with rows
+    written by other processes.
+
+    Several gateway processes may share one database: a job is claimed
+    with a conditional UPDATE tagged with this queue's ``owner`` id and
+    leased for ``JOB_LEASE_SECONDS``, renewed by a heartbeat while it
+    prints. Jobs whose lease lapses are re-queued by whichever process
+    polls next.
+
+    Each lane has a circuit breaker (app.circuit_breaker): once it opens,
+    the worker stops taking jobs and probes the printer with backoff
+    instead, so an unplugged printer does not burn a full timeout per job.
+    """
+
     def __init__(self) -> None:
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
         self._task: Optional[asyncio.Task] = None
+        self._archive_task: Optional[asyncio.Task] = None
         self._stop_event = asyncio.Event()
-        self._active_jobs: set[int] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lanes: dict[int, PrinterLane] = {}
         self._locks: dict[int, asyncio.Lock] = {}
+        # Resolves callers waiting for a job to finish (MQTT, HTTP ?wait=).
+        self.completions = JobCompletionBus()
+        # Refuses new jobs past the queue / backlog limits.
+        self.admission = AdmissionController(self.depths)
 
     def start(self) -> None:
         if self._task and not self._task.done():
             return
+        self._loop = asyncio.get_running_loop()
         self._stop_event.clear()
+        add_job_queued_listener(self._on_job_queued)
+        add_job_status_listener(_count_job_status)
+        metrics.add_collector(self._collect_metrics)
+        self.completions.start()
+        for printer in list_printers():
+            if printer.get("enabled"):
+                self._get_lane(int(printer["id"]))
         self._task = asyncio.create_task(self._run())
+        if JOB_ARCHIVE_AFTER_DAYS > 0:
+            self._archive_task = asyncio.create_task(self._archive_loop())
 
     async def stop(self) -> None:
+        remove_job_queued_listener(self._on_job_queued)
+        remove_job_status_listener(_count_job_status)
+        metrics.remove_collector(self._collect_metrics)
+        self.completions.stop()
         self._stop_event.set()
+        for lane in self._lanes.values():
+            lane.has_work.set()
+            lane.breaker.wake.set()
         if self._task:
             await self._task
+        if self._archive_task:
+            await self._archive_task
+        workers = [lane.worker for lane in self._lanes.values() if lane.worker]
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def enqueue(self, job: Dict[str, Any]) -> None:
+        """Add a queued job to its printer's lane (event loop thread only)."""
+        self._get_lane(int(job["printer_id"])).push(job)
+
+    def _on_job_queued(self, job: Dict[str, Any]) -> None:
+        # Called from request threads and MQTT; hop onto the event loop.
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.enqueue(job)
+        else:
+            loop.call_soon_threadsafe(self.enqueue, job)
+
+    def _get_lane(self, printer_id: int) -> PrinterLane:
+        lane = self._lanes.get(printer_id)
+        if lane is None:
+            lane = self._lanes[printer_id] = PrinterLane(printer_id)
+        if (lane.worker is None or lane.worker.done()) and not self._stop_event.is_set():
+            lane.worker = asyncio.create_task(self._worker(lane))
+        return lane
+
+    def depths(self) -> Dict[int, int]:
+        """Jobs waiting per printer: queued, parked and the one printing."""
+        return {
+            printer_id: len(lane.queued)
+            + sum(map(len, lane.parked.values()))
+            + int(lane.active_job is not None)
+            for printer_id, lane in list(self._lanes.items())
+        }
+
+    def breakers(self) -> List[Dict[str, Any]]:
+        return [lane.breaker.snapshot() for _, lane in sorted(self._lanes.items())]
+
+    def _collect_metrics(self) -> List[GaugeFamily]:
+        lanes = sorted(self._lanes.items())
+        return [
+            ("queue_depth", "gauge", "Jobs waiting in the printer's lane",
+             [({"printer_id": str(pid)}, len(lane.heap)) for pid, lane in lanes]),
+            ("jobs_parked", "gauge", "Ordered-batch jobs waiting for their predecessor",
+             [({"printer_id": str(pid)}, sum(map(len, lane.parked.values()))) for pid, lane in lanes]),
+            ("printer_busy", "gauge", "1 while the printer's worker is printing a job",
+             [({"printer_id": str(pid)}, int(lane.active_job is not None)) for pid, lane in lanes]),
+            ("breaker_open", "gauge", "1 while the printer's circuit breaker is not closed",
+             [({"printer_id": str(pid)}, int(lane.breaker.state != "closed")) for pid, lane in lanes]),
+            ("job_waiters", "gauge", "Jobs somebody is waiting on (MQTT, ?wait=)",
+             [({}, self.completions.pending())]),
+        ]
+
+    def get_breaker(self, printer_id: int) -> Optional[CircuitBreaker]:
+        lane = self._lanes.get(printer_id)
+        return lane.breaker if lane else None
+
+    def probe_breaker(self, printer_id: int) -> Optional[Dict[str, Any]]:
+        """Probe an open breaker now instead of waiting for the backoff."""
+        lane = self._lanes.get(printer_id)
+        if lane is None:
+            return None
+        lane.breaker.wake.set()
+        return lane.breaker.snapshot()
 
     def _get_lock(self, printer_id: int) -> asyncio.Lock:
         if printer_id not in self._locks:
@@ -36,88 +277,229 @@ class JobQueue:
         return self._get_lock(printer_id)
 
     async def _run(self) -> None:
+        """Hydrate the lanes, then periodically reconcile with the database."""
+        while not self._stop_event.is_set():
+            try:
+                requeued, failed = await asyncio.to_thread(requeue_expired_jobs, JOB_MAX_RETRIES)
+                if requeued or failed:
+                    log_error(
+                        "JOB_LEASE_EXPIRED",
+                        {"requeued": [job["id"] for job in requeued], "failed": failed},
+                    )
+                refs = await asyncio.to_thread(list_job_refs, "queued")
+            except Exception as exc:  # noqa: BLE001
+                log_error("JOB_QUEUE_SYNC_FAILED", {"error": str(exc)})
+            else:
+                for ref in refs:
+                    self.enqueue(ref)
+                await self._release_finished_predecessors()
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _release_finished_predecessors(self) -> None:
+        """Release parked jobs whose predecessor finished in another process."""
+        for lane in list(self._lanes.values()):
+            for after_job_id in list(lane.parked):
+                try:
+                    pending = await asyncio.to_thread(self._is_pending, after_job_id)
+                except Exception as exc:  # noqa: BLE001
+                    log_error("JOB_QUEUE_SYNC_FAILED", {"error": str(exc)})
+                    return
+                if not pending:
+                    lane.release(after_job_id)
+
+    async def _archive_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                moved = await asyncio.to_thread(
+                    archive_finished_jobs, JOB_ARCHIVE_AFTER_DAYS, JOB_ARCHIVE_BATCH
+                )
+            except Exception as exc:  # noqa: BLE001
+                log_error("JOB_ARCHIVE_FAILED", {"error": str(exc)})
+            else:
+                if moved:
+                    log_info("JOB_ARCHIVE", {"moved": moved, "older_than_days": JOB_ARCHIVE_AFTER_DAYS})
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=JOB_ARCHIVE_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, lane: PrinterLane) -> None:
         while not self._stop_event.is_set():
-            await self._dispatch()
-            await asyncio.sleep(JOB_POLL_INTERVAL)
-
-    async def _dispatch(self) -> None:
-        queued_jobs = list_jobs_by_status("queued", limit=20)
-        for job in queued_jobs:
-            job_id = int(job["id"])
-            if job_id in self._active_jobs:
+            if lane.breaker.is_open:
+                await self._probe(lane)
+                continue
+            job_id = lane.pop()
+            if job_id is None:
+                await lane.has_work.wait()
                 continue
-            self._active_jobs.add(job_id)
-            asyncio.create_task(self._process_job(job))
+            lane.active_job = job_id
+            try:
+                await self._process_job(job_id, lane.printer_id)
+            except Exception as exc:  # noqa: BLE001
+                log_error("JOB_WORKER_ERROR", {"job_id": job_id, "printer_id": lane.printer_id, "error": str(exc)})
+            finally:
+                lane.active_job = None
+                lane.release(job_id)
 
-    async def _process_job(self, job: Dict[str, Any]) -> None:
-        job_id = int(job["id"])
-        printer_id = int(job["printer_id"])
+    async def _probe(self, lane: PrinterLane) -> None:
+        breaker = lane.breaker
+        delay = breaker.next_delay()
         try:
-            printer = get_printer(printer_id)
-            if not printer or not printer.get("enabled"):
-                update_job(
-                    job_id,
-                    {
-                        "status": "failed",
-                        "error": "Printer not found or disabled",
-                        "finished_at": now_iso(),
-                    },
+            await asyncio.wait_for(breaker.wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        if self._stop_event.is_set():
+            return
+        breaker.begin_probe()
+        printer = get_printer(lane.printer_id)
+        if not printer or not printer.get("enabled"):
+            # Nothing to probe; let the queued jobs fail the usual way.
+            breaker.record_success()
+            event_hub.publish("printer_status", {"printer_id": lane.printer_id, "breaker": breaker.snapshot()})
+            return
+        lock = self._get_lock(lane.printer_id)
+        try:
+            async with lock:
+                await device_executors.run_cancellable(
+                    lane.printer_id,
+                    BREAKER_PROBE_TIMEOUT_S + JOB_TIMEOUT_SECONDS,
+                    probe_printer,
+                    printer,
+                    grace_s=_cancel_grace_s(printer),
                 )
+        except Exception as exc:  # noqa: BLE001
+            breaker.record_probe_failure(exc)
+            log_error(
+                "PRINTER_BREAKER_PROBE_FAILED",
+                {"printer_id": lane.printer_id, "attempt": breaker.probe_attempts, "error": str(exc)},
+            )
+        else:
+            breaker.record_success()
+            log_info("PRINTER_BREAKER_CLOSED", {"printer_id": lane.printer_id, "queued": len(lane.queued)})
+        event_hub.publish("printer_status", {"printer_id": lane.printer_id, "breaker": breaker.snapshot()})
+
+    async def _process_job(self, job_id: int, printer_id: int) -> None:
+        job = get_job(job_id)
+        if not job or job["status"] != "queued":
+            return
+        if job.get("deadline") and datetime.fromisoformat(job["deadline"]) <= datetime.now(timezone.utc):
+            if mark_expired(job_id, {"queue_wait_ms": _queue_wait_ms(job)}):
+                log_error("JOB_EXPIRED", {"job_id": job_id, "printer_id": printer_id, "deadline": job["deadline"]})
+            return
+        after_job_id = job.get("after_job_id")
+        if after_job_id and self._is_pending(int(after_job_id)):
+            # Ordered batch: run after the predecessor (the poll releases
+            # it in case the predecessor finishes in another process).
+            self._get_lane(printer_id).park(int(after_job_id), job)
+            return
+        printer = get_printer(printer_id)
+        if not printer or not printer.get("enabled"):
+            # Another gateway may have claimed it since get_job.
+            if mark_failed(job_id, "Printer not found or disabled", from_status="queued"):
                 log_error("JOB_FAILED_PRINTER", {"job_id": job_id, "printer_id": printer_id})
+                await asyncio.to_thread(flush_logs)
+            return
+        lock = self._get_lock(printer_id)
+        async with lock:
+            if not mark_printing(job_id, owner=self.owner, lease_seconds=JOB_LEASE_SECONDS):
+                # Cancelled, or claimed by another process, while waiting for the lock.
+                log_info("JOB_SKIPPED", {"job_id": job_id, "printer_id": printer_id})
+                return
+            queue_wait_ms = _queue_wait_ms(job)
+            log_info(
+                "JOB_PRINTING",
+                {"job_id": job_id, "printer_id": printer_id, "owner": self.owner, "queue_wait_ms": queue_wait_ms},
+            )
+            JOB_QUEUE_WAIT.labels(printer_id).observe(queue_wait_ms / 1000)
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            started = time.monotonic()
+            try:
+                # On timeout the send is cancelled and given one frame to
+                # close the port before the printer lock is released.
+                result = await device_executors.run_cancellable(
+                    printer_id,
+                    JOB_TIMEOUT_SECONDS,
+                    send_payload,
+                    printer,
+                    job.get("payload_type", "text"),
+                    job.get("payload", {}),
+                    grace_s=_cancel_grace_s(printer),
+                )
+            except Exception as exc:  # noqa: BLE001
+                heartbeat.cancel()
+                elapsed = time.monotonic() - started
+                JOB_DURATION.labels(printer_id, job.get("payload_type"), "error").observe(elapsed)
+                self.admission.record_duration(printer_id, elapsed)
+                self._record_outcome(printer_id, exc)
+                await self._handle_failure(job, exc, queue_wait_ms)
+            else:
+                heartbeat.cancel()
+                elapsed = time.monotonic() - started
+                JOB_DURATION.labels(printer_id, job.get("payload_type"), "success").observe(elapsed)
+                self.admission.record_duration(printer_id, elapsed)
+                self._record_outcome(printer_id, None)
+                result = {**(result or {}), "queue_wait_ms": queue_wait_ms}
+                if not mark_success(job_id, result, owner=self.owner):
+                    log_error("JOB_LEASE_LOST", {"job_id": job_id, "printer_id": printer_id, "result": result})
+                    return
+                log_info("JOB_SUCCESS", {"job_id": job_id, "printer_id": printer_id, "result": result})
+
+    def _record_outcome(self, printer_id: int, exc: Optional[Exception]) -> None:
+        breaker = self._get_lane(printer_id).breaker
+        if exc is None or not is_transport_failure(exc):
+            # The device answered (even if with an error): the link is fine.
+            breaker.record_success()
+        elif breaker.record_failure(exc):
+            log_error(
+                "PRINTER_BREAKER_OPEN",
+                {"printer_id": printer_id, "failures": breaker.failures, "error": breaker.last_error},
+            )
+            event_hub.publish("printer_status", {"printer_id": printer_id, "breaker": breaker.snapshot()})
+
+    @staticmethod
+    def _is_pending(job_id: int) -> bool:
+        job = get_job(job_id)
+        return bool(job) and job["status"] in ("queued", "printing")
+
+    async def _heartbeat(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                renewed = await asyncio.to_thread(heartbeat_job, job_id, self.owner, JOB_LEASE_SECONDS)
+            except Exception as exc:  # noqa: BLE001
+                log_error("JOB_HEARTBEAT_FAILED", {"job_id": job_id, "error": str(exc)})
+                continue
+            if not renewed:
+                log_error("JOB_LEASE_LOST", {"job_id": job_id, "owner": self.owner})
                 return
-            lock = self._get_lock(printer_id)
-            async with lock:
-                update_job(job_id, {"status": "printing", "started_at": now_iso(), "error": None})
-                log_info("JOB_PRINTING", {"job_id": job_id, "printer_id": printer_id})
-                try:
-                    result = await asyncio.wait_for(
-                        asyncio.to_thread(
-                            send_payload,
-                            printer,
-                            job.get("payload_type", "text"),
-                            job.get("payload", {}),
-                        ),
-                        timeout=JOB_TIMEOUT_SECONDS,
-                    )
-                except Exception as exc:  # noqa: BLE001
-                    await self._handle_failure(job, exc)
-                else:
-                    update_job(
-                        job_id,
-                        {
-                            "status": "success",
-                            "finished_at": now_iso(),
-                            "error": None,
-                            "result": result,
-                        },
-                    )
-                    log_info("JOB_SUCCESS", {"job_id": job_id, "printer_id": printer_id, "result": result})
-        finally:
-            self._active_jobs.discard(job_id)
 
-    async def _handle_failure(self, job: Dict[str, Any], exc: Exception) -> None:
+    async def _handle_failure(self, job: Dict[str, Any], exc: Exception, queue_wait_ms: int) -> None:
         job_id = int(job["id"])
         retries = int(job.get("retries", 0))
         error_message = str(exc)
-        if retries < JOB_MAX_RETRIES:
-            update_job(
+        flight_recorder.dump(int(job["printer_id"]), reason="job_failed", job_id=job_id)
+        retry = retries < JOB_MAX_RETRIES
+        if retry:
+            applied = mark_requeued(job_id, error_message, retries + 1, owner=self.owner)
+        else:
+            applied = mark_failed(
                 job_id,
-                {
-                    "status": "queued",
-                    "retries": retries + 1,
-                    "error": error_message,
-                    "started_at": None,
-                },
+                error_message,
+                retries=retries + 1,
+                owner=self.owner,
+                result={"queue_wait_ms": queue_wait_ms},
             )
+        if not applied:
+            # The lease lapsed and the job was taken over (or cancelled).
+            log_error("JOB_LEASE_LOST", {"job_id": job_id, "printer_id": job["printer_id"], "error": error_message})
+            return
+        if retry:
+            JOB_RETRIES.labels(job["printer_id"]).inc()
             log_error("JOB_RETRY", {"job_id": job_id, "error": error_message})
+            self.enqueue(job)
         else:
-            update_job(
-                job_id,
-                {
-                    "status": "failed",
-                    "retries": retries + 1,
-                    "error": error_message,
-                    "finished_at": now_iso(),
-                },
-            )
             log_error("JOB_FAILED", {"job_id": job_id, "error": error_message})
+            await asyncio.to_thread(flush_logs)
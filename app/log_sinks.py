@@ -0,0 +1,225 @@
+"""Log sinks fed by the background log writer.
+
+Every batch taken off the log queue is offered to each enabled sink; a sink
+keeps the records that pass its minimum level and message-prefix filters:
+
+  sqlite  — the partitioned log tables read by ``GET /api/logs``
+  file    — append-only NDJSON file, rotated by size
+  stdout  — Python ``logging`` (container / console output)
+  events  — the live ``GET /api/events`` stream (app/events.py)
+
+Sinks are selected and filtered through ``settings.LOG_SINKS`` and
+``settings.LOG_SINK_CONFIG``. Flight-recorder dumps (context ``trace_dump``)
+and frames of printers at trace level "frames" (context ``trace_frames``)
+were explicitly requested, so the SQLite sink keeps them regardless of its
+filters.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from app.db import create_logs
+from app.events import event_hub
+
+LEVEL_ORDER = {"trace": 0, "debug": 10, "info": 20, "warning": 30, "error": 40}
+
+_PY_LEVELS = {
+    "trace": logging.DEBUG,
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+
+def _prefixes(value: Any) -> tuple:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(",")
+    return tuple(item.strip() for item in value if item and item.strip())
+
+
+class LogSink(ABC):
+    """Base sink: filtering plus a ``write`` hook for the accepted records."""
+
+    name = "sink"
+    keeps_requested_traces = False
+
+    def __init__(
+        self,
+        level: str = "trace",
+        include: Any = None,
+        exclude: Any = None,
+    ) -> None:
+        self.level = level.strip().lower()
+        self._min_level = LEVEL_ORDER.get(self.level, 0)
+        self.include = _prefixes(include)
+        self.exclude = _prefixes(exclude)
+
+    def accepts(self, entry: Dict[str, Any]) -> bool:
+        if self.keeps_requested_traces:
+            context = entry.get("context") or {}
+            if context.get("trace_dump") or context.get("trace_frames"):
+                return True
+        level = LEVEL_ORDER.get(entry["level"], LEVEL_ORDER["info"])
+        if level < self._min_level:
+            return False
+        # Prefix filters thin out chatty records; errors always pass.
+        if level >= LEVEL_ORDER["error"]:
+            return True
+        message = entry["message"]
+        if self.include and not message.startswith(self.include):
+            return False
+        if self.exclude and message.startswith(self.exclude):
+            return False
+        return True
+
+    @abstractmethod
+    def write(self, entries: List[Dict[str, Any]]) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "level": self.level,
+            "include": list(self.include),
+            "exclude": list(self.exclude),
+        }
+
+
+class SqliteSink(LogSink):
+    name = "sqlite"
+    keeps_requested_traces = True
+
+    def write(self, entries: List[Dict[str, Any]]) -> int:
+        return create_logs(entries)
+
+
+class NdjsonFileSink(LogSink):
+    """One JSON object per line; rotates to ``.1`` … ``.N`` past ``max_bytes``."""
+
+    name = "file"
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 10 * 1024 * 1024,
+        backups: int = 5,
+        **filters: Any,
+    ) -> None:
+        super().__init__(**filters)
+        self.path = Path(path)
+        self.max_bytes = max(0, max_bytes)
+        self.backups = max(0, backups)
+        self._handle = None
+        self._lock = threading.Lock()
+
+    def write(self, entries: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            handle = self._open()
+            for entry in entries:
+                record = {
+                    "created_at": entry["created_at"],
+                    "level": entry["level"],
+                    "message": entry["message"],
+                    "context": entry.get("context"),
+                }
+                handle.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            handle.flush()
+            if self.max_bytes and handle.tell() >= self.max_bytes:
+                self._rotate()
+        return len(entries)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "path": str(self.path), "max_bytes": self.max_bytes, "backups": self.backups}
+
+    def _open(self):
+        if self._handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = open(self.path, "a", encoding="utf-8")
+        return self._handle
+
+    def _rotate(self) -> None:
+        self._handle.close()
+        self._handle = None
+        if self.backups == 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+
+
+class StdoutSink(LogSink):
+    name = "stdout"
+
+    def __init__(self, logger_name: str = "print_gateway", **filters: Any) -> None:
+        super().__init__(**filters)
+        self._logger = logging.getLogger(logger_name)
+
+    def write(self, entries: List[Dict[str, Any]]) -> int:
+        for entry in entries:
+            self._logger.log(_PY_LEVELS.get(entry["level"], logging.INFO), entry["message"])
+        return len(entries)
+
+
+class EventSink(LogSink):
+    """Pushes records to ``GET /api/events`` subscribers as ``log`` events.
+
+    Records are not yet in SQLite (no ``id``); clients that need ids re-read
+    ``GET /api/logs``.
+    """
+
+    name = "events"
+
+    def write(self, entries: List[Dict[str, Any]]) -> int:
+        for entry in entries:
+            context = entry.get("context") or {}
+            event_hub.publish("log", {
+                "level": entry["level"],
+                "message": entry["message"],
+                "context": entry.get("context"),
+                "created_at": entry["created_at"],
+                "correlation_id": context.get("correlation_id"),
+                "printer_id": context.get("printer_id"),
+                "job_id": context.get("job_id"),
+            })
+        return len(entries)
+
+
+SINK_TYPES: Dict[str, Type[LogSink]] = {
+    "sqlite": SqliteSink,
+    "file": NdjsonFileSink,
+    "stdout": StdoutSink,
+    "events": EventSink,
+}
+
+
+def build_sinks(names: Sequence[str], config: Optional[Dict[str, Dict[str, Any]]] = None) -> List[LogSink]:
+    """Instantiate the enabled sinks from their settings entries."""
+    config = config or {}
+    sinks: List[LogSink] = []
+    for name in names:
+        sink_type = SINK_TYPES.get(name)
+        if sink_type is None:
+            raise ValueError(f"Unknown log sink: {name} (known: {', '.join(SINK_TYPES)})")
+        sinks.append(sink_type(**config.get(name, {})))
+    return sinks
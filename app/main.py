@@ -8,7 +8,10 @@ from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.api import router as api_router
-from app.db import init_db
+from app.app_logging import start_log_writer, stop_log_writer
+from app.db import close_connections, init_db, printer_registry
+from app.device_io import device_executors
+from app.events import event_hub
 from app.mqtt_client import mqtt_bridge
 from app.settings import STATIC_DIR
 from app.state import job_queue
@@ -17,11 +20,18 @@ from app.state import job_queue
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     init_db()
+    printer_registry.load()
+    start_log_writer()
+    event_hub.start()
     job_queue.start()
     mqtt_bridge.start()
     yield
     await mqtt_bridge.stop()
     await job_queue.stop()
+    device_executors.shutdown()
+    event_hub.stop()
+    stop_log_writer()
+    close_connections()
 
 
 app = FastAPI(title="Print Gateway", version="0.1.0", lifespan=lifespan)
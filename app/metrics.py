@@ -0,0 +1,235 @@
+"""In-process metrics behind ``GET /api/metrics`` (Prometheus text format).
+
+Counters and histograms are updated from request threads, device threads
+and the event loop, each under its own small lock, so recording a sample
+costs a dict lookup and an addition. Gauges describing current state
+(queue depth, breaker state, executor load) are not stored: their owners
+register a collector that is read at scrape time. Nothing here touches
+SQLite.
+
+Label values are bound once with ``labels(...)``; hot paths (transport
+reads) keep the bound child around.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# (name, type, help, [(labels, value), ...])
+GaugeFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Unlabelled metrics are exported from the start, as 0.
+            self._children[()] = self._new_child()
+
+    def labels(self, *values: object):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _items(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in sorted(items)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in self._items():
+            lines.extend(self._render_child(labels, child))
+        return lines
+
+    @abstractmethod
+    def _render_child(self, labels: Dict[str, str], child) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def _render_child(self, labels: Dict[str, str], child: _CounterChild) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def observe(self, value: float) -> None:
+        """Record a sample on the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, labels: Dict[str, str], child: _HistogramChild) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), counts):
+            cumulative += count
+            bucket_labels = {**labels, "le": _format_value(bound)}
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "print_gateway_") -> None:
+        self.prefix = prefix
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[GaugeFamily]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self.prefix + name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(self.prefix + name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[GaugeFamily]]) -> None:
+        """Register a scrape-time source of gauges (current state)."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[GaugeFamily]]) -> None:
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in list(self._collectors):
+            for name, kind, help, samples in collector():
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# ── Jobs ──────────────────────────────────────────────────────────
+JOBS = metrics.counter("jobs_total", "Job status transitions", ("printer_id", "status"))
+JOB_QUEUE_WAIT = metrics.histogram(
+    "job_queue_wait_seconds", "Enqueue to start of printing", ("printer_id",), QUEUE_WAIT_BUCKETS
+)
+JOB_DURATION = metrics.histogram(
+    "job_duration_seconds", "Start to end of a print attempt", ("printer_id", "payload_type", "outcome")
+)
+JOB_RETRIES = metrics.counter("job_retries_total", "Failed attempts re-queued for retry", ("printer_id",))
+ADMISSION_REJECTED = metrics.counter(
+    "admission_rejected_total", "Jobs refused by admission control", ("printer_id", "reason")
+)
+
+# ── Datecs protocol ───────────────────────────────────────────────
+DATECS_RTT = metrics.histogram(
+    "datecs_command_seconds", "send_command round trip (request frame to parsed response)", ("command",)
+)
+DATECS_RETRIES = metrics.counter("datecs_command_retries_total", "send_command re-sends", ("command",))
+DATECS_TIMEOUTS = metrics.counter("datecs_command_timeouts_total", "send_command attempts without response", ("command",))
+DATECS_NAKS = metrics.counter("datecs_naks_total", "NAK bytes received from Datecs printers")
+
+# ── Transports ────────────────────────────────────────────────────
+TRANSPORT_BYTES = metrics.counter(
+    "transport_bytes_total", "Bytes written to / read from devices", ("transport", "direction")
+)
+
+DEVICE_QUERIES = metrics.counter(
+    "device_query_total", "Read-only device queries by how they were served", ("query", "result")
+)
+
+# ── MQTT ──────────────────────────────────────────────────────────
+MQTT_MESSAGES = metrics.counter("mqtt_messages_total", "MQTT messages received")
+MQTT_PUBLISHES = metrics.counter("mqtt_publish_total", "MQTT publish attempts", ("result",))
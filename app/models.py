@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Literal, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -76,6 +77,18 @@ class JobCreate(BaseModel):
         "pinpad_ping",
     ]
     payload: Dict[str, Any]
+    # Higher runs first; defaults per payload type (PRINT_GATEWAY_JOB_PRIORITIES).
+    priority: Optional[int] = None
+    # Not printed if still queued after this moment (status becomes "expired").
+    deadline: Optional[datetime] = None
+    # Repeat submissions with the same key return the existing job.
+    idempotency_key: Optional[str] = Field(None, max_length=200)
+
+
+class JobBatchCreate(BaseModel):
+    jobs: List[JobCreate] = Field(..., min_length=1, max_length=500)
+    # Run each printer's jobs in submission order, regardless of priority.
+    ordered: bool = False
 
 
 class JobOut(BaseModel):
@@ -91,6 +104,19 @@ class JobOut(BaseModel):
     updated_at: str
     started_at: Optional[str] = None
     finished_at: Optional[str] = None
+    owner: Optional[str] = None
+    lease_expires_at: Optional[str] = None
+    heartbeat_at: Optional[str] = None
+    priority: int = 0
+    deadline: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    after_job_id: Optional[int] = None
+    archived: bool = False
+
+
+class JobBatchOut(BaseModel):
+    job_ids: List[int]
+    jobs: List[JobOut]
 
 
 class LogOut(BaseModel):
@@ -99,3 +125,6 @@ class LogOut(BaseModel):
     message: str
     context: Optional[Dict[str, Any]] = None
     created_at: str
+    correlation_id: Optional[str] = None
+    printer_id: Optional[int] = None
+    job_id: Optional[int] = None
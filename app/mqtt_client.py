@@ -19,8 +19,13 @@ from collections import deque
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from app.app_logging import log_error, log_info
-from app.db import create_job, get_job, list_printers
+from app.admission import AdmissionRejected
+from app.app_logging import log_error, log_info, log_warning
+from app.db import create_job, find_job_by_idempotency_key, list_printers, printer_registry
+from app.events import event_hub
+from app.job_bus import is_final
+from app.job_queue import default_priority, normalize_deadline
+from app.metrics import MQTT_MESSAGES, MQTT_PUBLISHES
 from app.settings import (
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
@@ -33,6 +38,7 @@ from app.settings import (
     MQTT_WS_PATH,
     PRINTER_GUID,
 )
+from app.state import job_queue
 
 logger = logging.getLogger("mqtt")
 
@@ -42,8 +48,6 @@ _TOPIC_TO_PAYLOAD_TYPE = {
     "report": "report",
 }
 
-# How often to poll for job completion (seconds)
-_JOB_POLL_INTERVAL = 1.0
 # Max time to wait for a job to finish before giving up (seconds)
 _JOB_WAIT_TIMEOUT = 60.0
 
@@ -61,6 +65,7 @@ class MqttBridge:
         self._last_message: Optional[Dict[str, Any]] = None
         self._messages: deque[Dict[str, Any]] = deque(maxlen=self.MAX_HISTORY)
         self._printer_id: Optional[int] = None
+        self._printer_version = -1
 
     @property
     def connected(self) -> bool:
@@ -80,8 +85,11 @@ class MqttBridge:
 
     def _resolve_printer_id(self) -> Optional[int]:
         """Find the first enabled printer to use for MQTT jobs."""
-        if self._printer_id is not None:
+        # Re-resolve whenever a printer was added, changed or removed.
+        if self._printer_id is not None and self._printer_version == printer_registry.version:
             return self._printer_id
+        self._printer_id = None
+        self._printer_version = printer_registry.version
         printers = list_printers()
         for p in printers:
             if p.get("enabled"):
@@ -125,14 +133,17 @@ class MqttBridge:
     async def publish(self, topic: str, payload: Any, qos: int = 1) -> bool:
         """Publish a JSON message. Returns True on success."""
         if not self._connected or not self._client:
+            MQTT_PUBLISHES.labels("not_connected").inc()
             log_error("MQTT_PUBLISH_NOT_CONNECTED", {"topic": topic})
             return False
         try:
             msg = json.dumps(payload, ensure_ascii=False, default=str)
             await self._client.publish(topic, msg.encode("utf-8"), qos=qos)
+            MQTT_PUBLISHES.labels("ok").inc()
             log_info("MQTT_PUBLISH", {"topic": topic, "payload": payload})
             return True
         except Exception as exc:
+            MQTT_PUBLISHES.labels("error").inc()
             log_error("MQTT_PUBLISH_ERROR", {"topic": topic, "error": str(exc)})
             return False
 
@@ -159,6 +170,10 @@ class MqttBridge:
 
     # ── Internal ──────────────────────────────────────────────────
 
+    def _publish_event(self, message: Optional[Dict[str, Any]] = None) -> None:
+        """Push the bridge status (and a received message) to GET /api/events."""
+        event_hub.publish("mqtt", {"status": self.get_status(), "message": message})
+
     async def _run(self) -> None:
         """Connect with auto-reconnect and listen for messages."""
         import aiomqtt
@@ -182,6 +197,7 @@ class MqttBridge:
                         "broker": f"{MQTT_BROKER_HOST}:{MQTT_BROKER_PORT}",
                         "subscribe_topic": self.subscribe_topic,
                     })
+                    self._publish_event()
 
                     await client.subscribe(self.subscribe_topic)
 
@@ -191,9 +207,11 @@ class MqttBridge:
             except asyncio.CancelledError:
                 log_info("MQTT_CANCELLED", {})
                 self._connected = False
+                self._publish_event()
                 return
             except Exception as exc:
                 self._connected = False
+                self._publish_event()
                 log_error("MQTT_CONNECTION_ERROR", {"error": str(exc)})
                 log_info("MQTT_RECONNECTING", {"wait_seconds": 5})
                 await asyncio.sleep(5)
@@ -213,6 +231,7 @@ class MqttBridge:
             pass
 
         self._message_count += 1
+        MQTT_MESSAGES.inc()
         entry = {
             "id": self._message_count,
             "topic": topic,
@@ -222,6 +241,7 @@ class MqttBridge:
         }
         self._last_message = entry
         self._messages.append(entry)
+        self._publish_event(entry)
 
         log_info("MQTT_MESSAGE", {
             "topic": topic,
@@ -250,11 +270,44 @@ class MqttBridge:
             await self._publish_result(request_id, "failed", error="No enabled printer found")
             return
 
+        # A redelivered message (QoS 1) maps back to the job it created.
+        idempotency_key = payload_parsed.get("idempotency_key") or request_id or None
+        job: Optional[Dict[str, Any]] = None
+        try:
+            job_queue.admission.check({printer_id: 1})
+        except AdmissionRejected as exc:
+            job = find_job_by_idempotency_key(idempotency_key) if idempotency_key else None
+            if job is None:
+                # Fail now rather than after hours in an overloaded queue.
+                log_warning("MQTT_JOB_REJECTED", {
+                    "printer_id": printer_id,
+                    "request_id": request_id,
+                    "reason": exc.reason,
+                    "retry_after_s": exc.retry_after_s,
+                })
+                await self._publish_result(
+                    request_id,
+                    "failed",
+                    result={"reason": exc.reason, "retry_after_s": exc.retry_after_s},
+                    error=str(exc),
+                )
+                return
+            job["idempotent_replay"] = True
+
         # Create job in the queue — the existing JobQueue will pick it up
         try:
-            job = create_job(printer_id, payload_type, payload_parsed)
+            if job is None:
+                priority = payload_parsed.get("priority")
+                job = create_job(
+                    printer_id,
+                    payload_type,
+                    payload_parsed,
+                    priority=default_priority(payload_type) if priority is None else int(priority),
+                    deadline=normalize_deadline(payload_parsed.get("deadline")),
+                    idempotency_key=idempotency_key,
+                )
             job_id = int(job["id"])
-            log_info("MQTT_JOB_CREATED", {
+            log_info("MQTT_JOB_REPLAYED" if job.get("idempotent_replay") else "MQTT_JOB_CREATED", {
                 "job_id": job_id,
                 "printer_id": printer_id,
                 "payload_type": payload_type,
@@ -269,22 +322,16 @@ class MqttBridge:
         asyncio.create_task(self._wait_and_publish(job_id, request_id))
 
     async def _wait_and_publish(self, job_id: int, request_id: str) -> None:
-        """Poll for job completion, then publish result via MQTT."""
-        elapsed = 0.0
-        while elapsed < _JOB_WAIT_TIMEOUT:
-            await asyncio.sleep(_JOB_POLL_INTERVAL)
-            elapsed += _JOB_POLL_INTERVAL
-            job = get_job(job_id)
-            if not job:
-                break
-            if job["status"] in ("success", "failed"):
-                await self._publish_result(
-                    request_id=request_id,
-                    status=job["status"],
-                    result=job.get("result"),
-                    error=job.get("error"),
-                )
-                return
+        """Wait for job completion (completion bus, no polling), then publish result via MQTT."""
+        job = await job_queue.completions.wait(job_id, _JOB_WAIT_TIMEOUT)
+        if is_final(job):
+            await self._publish_result(
+                request_id=request_id,
+                status=job["status"],
+                result=job.get("result"),
+                error=job.get("error"),
+            )
+            return
 
         # Timeout
         log_error("MQTT_JOB_TIMEOUT", {"job_id": job_id, "request_id": request_id})
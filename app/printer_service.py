@@ -4,10 +4,13 @@ from typing import Any, Dict
 
 from app.adapters import get_adapter
 from app.adapters.datecs_base import DatecsBaseAdapter
+from app.adapters.datecspay_bluepad import DatecsPayBluePadAdapter
 from app.app_logging import log_info
+from app.cancellation import CancelToken, cancel_scope, check_cancelled
 from app.datecs_fiscal import fiscal_operation
 from app.datecs_print import print_datecs_payload
-from app.settings import GLOBAL_DRY_RUN
+from app.settings import BREAKER_PROBE_TIMEOUT_S, GLOBAL_DRY_RUN
+from app.trace import trace_scope
 from app.transports.factory import create_transport
 
 PINPAD_PAYLOAD_TYPES = {
@@ -23,7 +26,66 @@ def build_payload(printer: Dict[str, Any], payload_type: str, payload: Dict[str,
     return adapter.build_payload(payload_type, payload)
 
 
-def send_payload(printer: Dict[str, Any], payload_type: str, payload: Dict[str, Any]) -> Dict[str, Any] | None:
+def probe_printer(
+    printer: Dict[str, Any],
+    timeout_s: float = BREAKER_PROBE_TIMEOUT_S,
+    cancel_token: CancelToken | None = None,
+) -> None:
+    """Cheapest round trip that proves the device answers; raises if it does not.
+
+    Datecs printers get a single status command (0x4A, no retries), pinpads a
+    Borica PING, other printers just an open/close of the transport.
+    """
+    if GLOBAL_DRY_RUN or printer.get("dry_run"):
+        return
+    with trace_scope(printer), cancel_scope(cancel_token):
+        adapter = get_adapter(printer["model"], printer.get("config") or {})
+        transport = create_transport(printer)
+        transport.open()
+        try:
+            if isinstance(adapter, DatecsBaseAdapter):
+                from app.datecs_fiscal import CMD_STATUS, _SEQ_BY_PRINTER, _encode_data
+                from app.datecs_protocol import next_seq, send_command
+
+                printer_id = int(printer["id"])
+                seq = _SEQ_BY_PRINTER.get(printer_id, 0x20)
+                send_command(
+                    transport,
+                    cmd=CMD_STATUS,
+                    data=_encode_data(adapter, adapter.data_builder.status_data()),
+                    seq=seq,
+                    timeout_s=timeout_s,
+                    retries=0,
+                    protocol_format=getattr(adapter, "protocol_format", "hex4"),
+                    status_length=int(getattr(adapter, "status_length", 8) or 8),
+                )
+                _SEQ_BY_PRINTER[printer_id] = next_seq(seq)
+            elif isinstance(adapter, DatecsPayBluePadAdapter):
+                from app.datecspay_protocol import BorCmd, borica_command
+
+                # Any answer, even an error status, means the link is up.
+                borica_command(transport, BorCmd.PING, timeout_s=timeout_s)
+        finally:
+            transport.close()
+
+
+def send_payload(
+    printer: Dict[str, Any],
+    payload_type: str,
+    payload: Dict[str, Any],
+    cancel_token: CancelToken | None = None,
+) -> Dict[str, Any] | None:
+    """Send a payload to the device.
+
+    Setting ``cancel_token`` makes the protocol layers stop at the next frame
+    and close the transport (see app.cancellation).
+    """
+    with trace_scope(printer), cancel_scope(cancel_token):
+        check_cancelled()
+        return _send_payload(printer, payload_type, payload)
+
+
+def _send_payload(printer: Dict[str, Any], payload_type: str, payload: Dict[str, Any]) -> Dict[str, Any] | None:
     dry_run = GLOBAL_DRY_RUN or bool(printer.get("dry_run"))
     bytes_sent: int | None = None
     mode = "raw"
@@ -15,16 +15,136 @@ def _env_bool(name: str, default: bool = False) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _env_int_map(name: str, default: str) -> dict[str, int]:
+    """Parse ``key=int,key=int`` pairs, e.g. ``trace=3,error=90``."""
+    result: dict[str, int] = {}
+    for item in os.getenv(name, default).split(","):
+        key, _, value = item.partition("=")
+        if key.strip() and value.strip():
+            result[key.strip().lower()] = int(value)
+    return result
+
+
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT_DIR / "data"
 DB_PATH = Path(os.getenv("PRINT_GATEWAY_DB", str(DATA_DIR / "print_gateway.sqlite")))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("PRINT_GATEWAY_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("PRINT_GATEWAY_SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+SQLITE_CACHED_STATEMENTS = int(os.getenv("PRINT_GATEWAY_SQLITE_CACHED_STATEMENTS", "256"))
 
 APP_HOST = os.getenv("PRINT_GATEWAY_HOST", "127.0.0.1")
 APP_PORT = int(os.getenv("PRINT_GATEWAY_PORT", "8787"))
 
-JOB_POLL_INTERVAL = float(os.getenv("PRINT_GATEWAY_POLL_INTERVAL", "1.0"))
+# New jobs wake the dispatcher immediately; polling only picks up rows
+# written by other processes.
+JOB_POLL_INTERVAL = float(os.getenv("PRINT_GATEWAY_POLL_INTERVAL", "15"))
 JOB_TIMEOUT_SECONDS = float(os.getenv("PRINT_GATEWAY_JOB_TIMEOUT", "15"))
 JOB_MAX_RETRIES = int(os.getenv("PRINT_GATEWAY_JOB_RETRIES", "1"))
+# A printing job is leased to the process printing it; the lease is renewed
+# every JOB_HEARTBEAT_SECONDS and a job whose lease lapses (crashed process)
+# goes back to the queue. Must be comfortably above JOB_TIMEOUT_SECONDS.
+JOB_LEASE_SECONDS = float(os.getenv("PRINT_GATEWAY_JOB_LEASE", "60"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("PRINT_GATEWAY_JOB_HEARTBEAT", "10"))
+# Default job priority per payload type when the request gives none; higher
+# runs first, so a cashier's receipt is not stuck behind kitchen tickets.
+JOB_DEFAULT_PRIORITIES = _env_int_map(
+    "PRINT_GATEWAY_JOB_PRIORITIES",
+    "fiscal_receipt=10,storno=10,pinpad_purchase=10,pinpad_void=10,cash=5",
+)
+# Every printer gets its own I/O thread (app/device_io.py); detection of
+# ports not yet tied to a printer shares this many threads.
+DEVICE_TOOL_WORKERS = int(os.getenv("PRINT_GATEWAY_DEVICE_TOOL_WORKERS", "4"))
+# Read-only device queries (status, datetime, refresh-info, pinpad info /
+# status) are coalesced per printer; a finished result is reused for this
+# many seconds (0: coalesce only).
+DEVICE_QUERY_TTL_S = float(os.getenv("PRINT_GATEWAY_DEVICE_QUERY_TTL", "2"))
+# Callers waiting for a job (MQTT results, POST /api/jobs?wait=) are woken
+# in-process; they re-read the job this often to catch jobs finished by
+# another process sharing the database.
+JOB_WAIT_FALLBACK_S = float(os.getenv("PRINT_GATEWAY_JOB_WAIT_FALLBACK", "5"))
+# Upper bound for POST /api/jobs?wait=<seconds>.
+JOB_WAIT_MAX_S = float(os.getenv("PRINT_GATEWAY_JOB_WAIT_MAX", "120"))
+# Circuit breaker: after this many consecutive transport failures a
+# printer's queue pauses and a status probe retries with exponential backoff
+# (BASE * 2^n seconds, capped at MAX, with jitter) until the printer answers.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("PRINT_GATEWAY_BREAKER_THRESHOLD", "3"))
+BREAKER_BACKOFF_BASE_S = float(os.getenv("PRINT_GATEWAY_BREAKER_BACKOFF_BASE", "2"))
+BREAKER_BACKOFF_MAX_S = float(os.getenv("PRINT_GATEWAY_BREAKER_BACKOFF_MAX", "60"))
+BREAKER_PROBE_TIMEOUT_S = float(os.getenv("PRINT_GATEWAY_BREAKER_PROBE_TIMEOUT", "2"))
+# A repeated idempotency key (HTTP or MQTT request_id) returns the existing
+# job for this many seconds after it was created.
+JOB_IDEMPOTENCY_WINDOW_S = float(os.getenv("PRINT_GATEWAY_IDEMPOTENCY_WINDOW", "86400"))
+# Admission control (app/admission.py): new jobs are refused with 429 /
+# an MQTT failure once a printer has this many jobs waiting, once its
+# estimated backlog (waiting jobs x observed job duration) exceeds
+# MAX_BACKLOG seconds, or once all printers together have GLOBAL_MAX jobs
+# waiting. 0 disables a limit. DEFAULT_JOB is the duration estimate until a
+# printer has finished a job.
+ADMISSION_PRINTER_MAX_QUEUED = int(os.getenv("PRINT_GATEWAY_ADMISSION_PRINTER_MAX", "200"))
+ADMISSION_GLOBAL_MAX_QUEUED = int(os.getenv("PRINT_GATEWAY_ADMISSION_GLOBAL_MAX", "1000"))
+ADMISSION_MAX_BACKLOG_S = float(os.getenv("PRINT_GATEWAY_ADMISSION_MAX_BACKLOG", "900"))
+ADMISSION_DEFAULT_JOB_S = float(os.getenv("PRINT_GATEWAY_ADMISSION_DEFAULT_JOB", "5"))
+# Finished jobs older than this many days move to jobs_archive (0 disables).
+JOB_ARCHIVE_AFTER_DAYS = float(os.getenv("PRINT_GATEWAY_JOB_ARCHIVE_DAYS", "30"))
+JOB_ARCHIVE_BATCH = int(os.getenv("PRINT_GATEWAY_JOB_ARCHIVE_BATCH", "500"))
+JOB_ARCHIVE_INTERVAL_S = float(os.getenv("PRINT_GATEWAY_JOB_ARCHIVE_INTERVAL", "3600"))
+
+# ── Log writer ────────────────────────────────────────────────────
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("PRINT_GATEWAY_LOG_FLUSH_MS", "200"))
+LOG_FLUSH_BATCH = int(os.getenv("PRINT_GATEWAY_LOG_FLUSH_BATCH", "500"))
+LOG_QUEUE_SIZE = int(os.getenv("PRINT_GATEWAY_LOG_QUEUE_SIZE", "10000"))
+# Days to keep logs per level; "default" covers levels not listed.
+LOG_RETENTION_DAYS = _env_int_map(
+    "PRINT_GATEWAY_LOG_RETENTION", "trace=3,info=14,warning=30,error=90,default=30"
+)
+LOG_PURGE_INTERVAL_S = int(os.getenv("PRINT_GATEWAY_LOG_PURGE_INTERVAL", "3600"))
+
+# ── Log sinks ─────────────────────────────────────────────────────
+# Enabled sinks (see app/log_sinks.py). Each takes a minimum level and
+# comma-separated message prefixes: "include" keeps only matching messages,
+# "exclude" drops them. By default high-volume protocol frames go to the
+# NDJSON file only.
+LOG_SINKS = [
+    name.strip().lower()
+    for name in os.getenv("PRINT_GATEWAY_LOG_SINKS", "sqlite,file,stdout,events").split(",")
+    if name.strip()
+]
+_LOG_HIGH_VOLUME_PREFIXES = "DATECS_PROTOCOL_,PINPAD_RAW_PKT"
+
+
+def _sink_filters(name: str, level: str, exclude: str = "") -> dict:
+    prefix = f"PRINT_GATEWAY_LOG_{name.upper()}"
+    return {
+        "level": os.getenv(f"{prefix}_LEVEL", level),
+        "include": os.getenv(f"{prefix}_INCLUDE", ""),
+        "exclude": os.getenv(f"{prefix}_EXCLUDE", exclude),
+    }
+
+
+LOG_SINK_CONFIG = {
+    "sqlite": _sink_filters("sqlite", "info", _LOG_HIGH_VOLUME_PREFIXES),
+    "file": {
+        **_sink_filters("file", "trace"),
+        "path": Path(os.getenv("PRINT_GATEWAY_LOG_FILE", str(DATA_DIR / "logs" / "gateway.ndjson"))),
+        "max_bytes": int(os.getenv("PRINT_GATEWAY_LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024))),
+        "backups": int(os.getenv("PRINT_GATEWAY_LOG_FILE_BACKUPS", "5")),
+    },
+    "stdout": _sink_filters("stdout", "info", _LOG_HIGH_VOLUME_PREFIXES),
+    "events": _sink_filters("events", "info", _LOG_HIGH_VOLUME_PREFIXES),
+}
+
+# ── Live events (GET /api/events) ─────────────────────────────────
+# Events kept for clients resuming with Last-Event-ID, and per-client queue
+# size before a slow client is disconnected (it then resumes from the buffer).
+EVENTS_BUFFER_SIZE = int(os.getenv("PRINT_GATEWAY_EVENTS_BUFFER", "2000"))
+EVENTS_CLIENT_QUEUE = int(os.getenv("PRINT_GATEWAY_EVENTS_CLIENT_QUEUE", "1000"))
+EVENTS_KEEPALIVE_S = float(os.getenv("PRINT_GATEWAY_EVENTS_KEEPALIVE", "15"))
+
+# ── Protocol trace ────────────────────────────────────────────────
+# Default per-printer trace level when printer config has no "trace_level":
+# "off", "errors" (frames kept in memory, dumped on failure) or "frames".
+TRACE_DEFAULT_LEVEL = os.getenv("PRINT_GATEWAY_TRACE_LEVEL", "errors").strip().lower()
+TRACE_BUFFER_SIZE = int(os.getenv("PRINT_GATEWAY_TRACE_BUFFER", "500"))
 
 DATECS_BAUDRATES = [
     int(value)
@@ -0,0 +1,155 @@
+"""Per-printer protocol tracing with an in-memory flight recorder.
+
+Frame-level events (Datecs frames, pinpad packets) are not written to the
+log store by default. Each printer has a trace level in its ``config``:
+
+  off     — frame events are discarded
+  errors  — frame events go to a bounded per-printer ring buffer that is
+            dumped to the log store only when a job fails or a dump is
+            requested through the API (default)
+  frames  — frame events are buffered and also logged at level "trace"
+            (kept by the SQLite sink, so they show up in ``GET /api/logs``)
+
+Device code runs in worker threads; the printer a frame belongs to is
+carried by a context variable set with ``trace_scope(printer)``. Frames
+emitted outside a scope (detection, standalone scripts) are logged as usual.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from app.app_logging import log_error, log_info, log_trace, log_writer
+from app.db import now_iso
+from app.settings import TRACE_BUFFER_SIZE, TRACE_DEFAULT_LEVEL
+
+TRACE_LEVELS = ("off", "errors", "frames")
+
+
+@dataclass
+class TraceScope:
+    printer_id: int
+    level: str
+    correlation_id: Optional[str] = None
+
+
+_current_scope: ContextVar[Optional[TraceScope]] = ContextVar("trace_scope", default=None)
+
+
+def printer_trace_level(printer: Dict[str, Any]) -> str:
+    level = str((printer.get("config") or {}).get("trace_level") or TRACE_DEFAULT_LEVEL).lower()
+    return level if level in TRACE_LEVELS else "errors"
+
+
+class FlightRecorder:
+    """Bounded ring buffer of recent frame events, one per printer."""
+
+    def __init__(self, size: int) -> None:
+        self._size = max(1, size)
+        self._buffers: Dict[int, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, printer_id: int, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            buffer = self._buffers.get(printer_id)
+            if buffer is None:
+                buffer = self._buffers[printer_id] = deque(maxlen=self._size)
+            buffer.append(entry)
+
+    def snapshot(self, printer_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._buffers.get(printer_id) or ())
+
+    def clear(self, printer_id: int) -> None:
+        with self._lock:
+            self._buffers.pop(printer_id, None)
+
+    def dump(
+        self,
+        printer_id: int,
+        reason: str,
+        correlation_id: Optional[str] = None,
+        job_id: Optional[int] = None,
+    ) -> int:
+        """Persist and clear the printer's buffer. Returns the number of entries written."""
+        with self._lock:
+            buffer = self._buffers.pop(printer_id, None)
+        entries = list(buffer or ())
+        for entry in entries:
+            context = dict(entry.get("context") or {})
+            context.setdefault("printer_id", printer_id)
+            if correlation_id and not context.get("correlation_id"):
+                context["correlation_id"] = correlation_id
+            if job_id is not None:
+                context["job_id"] = job_id
+            context["trace_dump"] = reason
+            log_writer.enqueue("trace", entry["message"], context, created_at=entry["created_at"])
+        if entries:
+            log_info(
+                "TRACE_DUMP",
+                {
+                    "printer_id": printer_id,
+                    "reason": reason,
+                    "entries": len(entries),
+                    "correlation_id": correlation_id,
+                    "job_id": job_id,
+                },
+            )
+        return len(entries)
+
+
+flight_recorder = FlightRecorder(TRACE_BUFFER_SIZE)
+
+
+@contextmanager
+def trace_scope(printer: Dict[str, Any]) -> Iterator[TraceScope]:
+    """Attribute frame events emitted inside the block to ``printer``."""
+    scope = TraceScope(printer_id=int(printer.get("id") or 0), level=printer_trace_level(printer))
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def set_trace_correlation(correlation_id: str) -> None:
+    """Tag subsequent frame events in the current scope with ``correlation_id``."""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.correlation_id = correlation_id
+
+
+def trace_frame(message: str, context: Dict[str, Any]) -> None:
+    """Record a frame-level protocol event according to the printer's trace level."""
+    scope = _current_scope.get()
+    if scope is None:
+        log_info(message, context)
+        return
+    if scope.level == "off":
+        return
+    if scope.correlation_id and "correlation_id" not in context:
+        context = {**context, "correlation_id": scope.correlation_id}
+    flight_recorder.record(
+        scope.printer_id,
+        {"message": message, "context": context, "created_at": now_iso()},
+    )
+    if scope.level == "frames":
+        # Marked so the SQLite sink keeps it past its level/prefix filters.
+        log_trace(message, {**context, "trace_frames": True})
+
+
+def trace_error(message: str, context: Dict[str, Any]) -> None:
+    """Log a protocol error and keep it in the flight recorder next to its frames."""
+    scope = _current_scope.get()
+    if scope is not None and scope.level != "off":
+        if scope.correlation_id and "correlation_id" not in context:
+            context = {**context, "correlation_id": scope.correlation_id}
+        flight_recorder.record(
+            scope.printer_id,
+            {"message": message, "context": context, "created_at": now_iso()},
+        )
+    log_error(message, context)
@@ -7,8 +7,12 @@ import serial
 from serial.tools import list_ports
 
 from app.app_logging import log_info, log_warning
+from app.metrics import TRANSPORT_BYTES
 from app.transports import BaseTransport
 
+_BYTES_WRITTEN = TRANSPORT_BYTES.labels("serial", "write")
+_BYTES_READ = TRANSPORT_BYTES.labels("serial", "read")
+
 
 @dataclass
 class SerialConfig:
@@ -54,6 +58,7 @@ class SerialTransport(BaseTransport):
             raise RuntimeError("Serial connection not initialized")
         self._serial.write(data)
         self._serial.flush()
+        _BYTES_WRITTEN.inc(len(data))
 
     def read(self, size: int = 1) -> bytes:
         if self.dry_run:
@@ -61,7 +66,10 @@ class SerialTransport(BaseTransport):
         self.open()
         if not self._serial:
             raise RuntimeError("Serial connection not initialized")
-        return self._serial.read(size)
+        data = self._serial.read(size)
+        if data:
+            _BYTES_READ.inc(len(data))
+        return data
 
     @staticmethod
     def _bytesize(data_bits: int) -> int:
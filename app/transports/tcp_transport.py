@@ -5,8 +5,12 @@ from dataclasses import dataclass
 from typing import Optional
 
 from app.app_logging import log_info, log_warning
+from app.metrics import TRANSPORT_BYTES
 from app.transports import BaseTransport
 
+_BYTES_WRITTEN = TRANSPORT_BYTES.labels("tcp", "write")
+_BYTES_READ = TRANSPORT_BYTES.labels("tcp", "read")
+
 
 @dataclass
 class TcpConfig:
@@ -56,6 +60,7 @@ class TcpTransport(BaseTransport):
         if not self._sock:
             raise RuntimeError("TCP connection not initialized")
         self._sock.sendall(data)
+        _BYTES_WRITTEN.inc(len(data))
 
     def read(self, size: int = 1) -> bytes:
         if self.dry_run:
@@ -65,6 +70,8 @@ class TcpTransport(BaseTransport):
             raise RuntimeError("TCP connection not initialized")
         try:
             data = self._sock.recv(size)
+            if data:
+                _BYTES_READ.inc(len(data))
             return data
         except socket.timeout:
             return b""
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from typing import Optional
 
 from app.app_logging import log_info
+from app.metrics import TRANSPORT_BYTES
 
 try:
     import usb.core
@@ -51,3 +52,4 @@ class USBTransport:
                 raise RuntimeError("USB OUT endpoint not found.")
             endpoint = endpoint.bEndpointAddress
         device.write(endpoint, data, timeout=self.config.timeout_ms)
+        TRANSPORT_BYTES.labels("usb", "write").inc(len(data))
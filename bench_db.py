@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark SQLite commit throughput: per-query connections vs pooled WAL connections.
+
+Runs create_job / update_job / mark_success / create_log against a throw-away database in
+two modes and prints commits/sec for each:
+
+  before — fresh sqlite3.connect() per query, default rollback journal
+           (the original app.db._connect behaviour)
+  after  — app.db pooled per-thread connection with WAL + synchronous=NORMAL
+
+Usage:  python bench_db.py [iterations]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+_tmp_dir = Path(tempfile.mkdtemp(prefix="fiscal-bench-"))
+os.environ["PRINT_GATEWAY_DB"] = str(_tmp_dir / "bench.sqlite")
+
+from app import db  # noqa: E402  (must import after PRINT_GATEWAY_DB is set)
+
+_pooled_connect = db._connect
+
+
+def _legacy_connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(db.DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _run(label: str, db_file: Path) -> dict:
+    db.DB_PATH = db_file
+    db.close_connections()
+    if label == "before":
+        db._connect = _legacy_connect
+        db._open_connection = _legacy_connect
+    else:
+        db._connect = _pooled_connect
+    db.init_db()
+    conn = sqlite3.connect(db_file)
+    conn.execute("INSERT INTO printers (name, model, transport, created_at, updated_at) VALUES ('b', 'fp700mx', 'serial', '', '')")
+    conn.commit()
+    conn.close()
+
+    results = {}
+    job_ids = []
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        job_ids.append(db.create_job(1, "text", {"lines": [f"line {i}"]})["id"])
+    results["create_job"] = ITERATIONS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for job_id in job_ids:
+        db.update_job(job_id, {"status": "printing", "started_at": db.now_iso()})
+    results["update_job"] = ITERATIONS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for job_id in job_ids:
+        db.mark_success(job_id, {"receipt_number": str(job_id)})
+    results["mark_success"] = ITERATIONS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        db.create_log("info", "BENCH", {"i": i, "correlation_id": "bench"})
+    results["create_log"] = ITERATIONS / (time.perf_counter() - start)
+    db.close_connections()
+    return results
+
+
+def main() -> None:
+    original_open = db._open_connection
+    before = _run("before", _tmp_dir / "before.sqlite")
+    db._open_connection = original_open
+    after = _run("after", _tmp_dir / "after.sqlite")
+    print(f"{ITERATIONS} iterations per operation (commits/sec)")
+    print(f"{'operation':<12} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name in ("create_job", "update_job", "mark_success", "create_log"):
+        print(f"{name:<12} {before[name]:>10.0f} {after[name]:>10.0f} {after[name] / before[name]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
 import { useEffect, useMemo, useState } from "react";
 
 const API_BASE = "/api";
+const JOBS_PAGE = 100;
+const LOGS_PAGE = 200;
+
+// Live events replace the oldest row instead of growing the list past the
+// pages already loaded.
+const prependLive = (list, row, pageSize) => [row, ...list].slice(0, Math.max(list.length, pageSize));
 
 const defaultForm = {
   name: "",
@@ -443,14 +449,36 @@ function App() {
     setPrinters(data);
   };
 
+  // Refresh reloads the newest page and keeps any older pages already loaded.
   const refreshJobs = async () => {
-    const data = await apiRequest("/jobs?limit=100");
-    setJobs(data);
+    const data = await apiRequest(`/jobs?limit=${JOBS_PAGE}`);
+    setJobs((prev) => {
+      const oldest = data.length ? data[data.length - 1].id : Infinity;
+      return [...data, ...prev.filter((job) => job.id < oldest)];
+    });
+  };
+
+  const loadOlderJobs = async () => {
+    if (!jobs.length) return;
+    const data = await apiRequest(`/jobs?limit=${JOBS_PAGE}&before_id=${jobs[jobs.length - 1].id}`);
+    setJobs((prev) => [...prev, ...data]);
   };
 
   const refreshLogs = async () => {
-    const data = await apiRequest("/logs?limit=200");
-    setLogs(data);
+    const data = await apiRequest(`/logs?limit=${LOGS_PAGE}`);
+    setLogs((prev) => {
+      const oldest = data.length ? data[data.length - 1].created_at : "";
+      const ids = new Set(data.map((log) => log.id));
+      return [...data, ...prev.filter((log) => log.created_at < oldest && !ids.has(log.id))];
+    });
+  };
+
+  // Live log events have no database id yet (see applyLiveEvent).
+  const loadOlderLogs = async () => {
+    const oldest = [...logs].reverse().find((log) => log.id);
+    if (!oldest) return;
+    const data = await apiRequest(`/logs?limit=${LOGS_PAGE}&before_id=${oldest.id}`);
+    setLogs((prev) => [...prev, ...data]);
   };
 
   const refreshMqtt = async () => {
@@ -1060,24 +1088,79 @@ function App() {
     }
   }, [printers]);
 
+  const applyLiveEvent = (kind, data, eventId) => {
+    if (kind === "job") {
+      setJobs((prev) => {
+        const index = prev.findIndex((job) => job.id === data.id);
+        if (index >= 0) return prev.map((job) => (job.id === data.id ? data : job));
+        if (prev.length && data.id < prev[0].id) return prev;
+        return prependLive(prev, data, JOBS_PAGE);
+      });
+    } else if (kind === "log") {
+      setLogs((prev) => prependLive(prev, { ...data, key: `live-${eventId}` }, LOGS_PAGE));
+    } else if (kind === "printer") {
+      refreshPrinters();
+    } else if (kind === "printer_status") {
+      if (data.status) {
+        setPrinterStatuses((prev) => ({ ...prev, [data.printer_id]: data.status }));
+      } else if (data.breaker?.state === "open") {
+        setPrinterStatuses((prev) => ({
+          ...prev,
+          [data.printer_id]: {
+            status: "error",
+            message: `Circuit breaker: ${data.breaker.last_error || "open"}`,
+            issues: ["breaker_open"],
+          },
+        }));
+      } else if (data.breaker?.state === "closed") {
+        checkPrinterStatus(data.printer_id);
+      }
+    } else if (kind === "mqtt") {
+      setMqttStatus(data.status);
+      if (data.message) setMqttMessages((prev) => [data.message, ...prev].slice(0, 50));
+    }
+  };
+
   useEffect(() => {
     refreshPrinters();
-    refreshJobs();
-    refreshLogs();
     refreshMqtt();
     refreshModels();
-    const interval = setInterval(() => {
+    // Live updates from GET /api/events. The browser reconnects by itself
+    // and resumes with Last-Event-ID; jobs and logs are re-read on every
+    // (re)connect and polled only while the stream is down.
+    let fallback = null;
+    const source = new EventSource(`${API_BASE}/events?log_level=info`);
+    source.onopen = () => {
+      clearInterval(fallback);
+      fallback = null;
       refreshJobs();
       refreshLogs();
-    }, 3000);
-    return () => clearInterval(interval);
+    };
+    source.onerror = () => {
+      if (fallback) return;
+      fallback = setInterval(() => {
+        refreshJobs();
+        refreshLogs();
+      }, 3000);
+    };
+    source.addEventListener("resync", () => {
+      refreshPrinters();
+      refreshJobs();
+      refreshLogs();
+      refreshMqtt();
+    });
+    ["job", "log", "printer", "printer_status", "mqtt"].forEach((kind) => {
+      source.addEventListener(kind, (event) => applyLiveEvent(kind, JSON.parse(event.data), event.lastEventId));
+    });
+    return () => {
+      source.close();
+      clearInterval(fallback);
+    };
   }, []);
 
   useEffect(() => {
     if (activeTab === "MQTT") {
       refreshMqtt();
-      const interval = setInterval(refreshMqtt, 2000);
-      return () => clearInterval(interval);
     }
   }, [activeTab]);
 
@@ -2571,12 +2654,14 @@ function App() {
                       printing: "info",
                       success: "success",
                       failed: "error",
+                      expired: "error",
                     }[job.status] || "";
                     const statusText = {
                       queued: "Чака",
                       printing: "Печата",
                       success: "Успех",
                       failed: "Грешка",
+                      expired: "Изтекъл",
                     }[job.status] || job.status;
                     
                     return (
@@ -2681,6 +2766,11 @@ function App() {
                 </tbody>
               </table>
             )}
+            {jobs.length > 0 && (
+              <button className="small" onClick={loadOlderJobs} disabled={loading}>
+                По-стари jobs
+              </button>
+            )}
           </div>
         </section>
       )}
@@ -2690,7 +2780,7 @@ function App() {
           <div className="card-header">
             <div>
               <h2>Системни логове</h2>
-              <p className="muted">Последните 200 събития.</p>
+              <p className="muted">Последните 200 събития, новите идват на живо (по-старите се зареждат отдолу).</p>
             </div>
             <button onClick={refreshLogs} disabled={loading}>
               Refresh
@@ -2699,7 +2789,7 @@ function App() {
           <div className="logs">
             {logs.length === 0 && <p className="muted">Няма логове.</p>}
             {logs.map((log) => (
-              <div key={log.id} className="log-item">
+              <div key={log.id ?? log.key} className="log-item">
                 <span className={`badge ${log.level}`}>{log.level}</span>
                 <div>
                   <strong>{log.message}</strong>
@@ -2714,6 +2804,11 @@ function App() {
                 </div>
               </div>
             ))}
+            {logs.length > 0 && (
+              <button className="small" onClick={loadOlderLogs} disabled={loading}>
+                По-стари логове
+              </button>
+            )}
           </div>
         </section>
       )}
@@ -1,6 +1,11 @@
-import sqlite3, json
+import os, sqlite3, json
 
-conn = sqlite3.connect(r'd:\UnrealSoft\FiscalAPI\data\print_gateway.sqlite')
+DB_FILE = r'd:\UnrealSoft\FiscalAPI\data\print_gateway.sqlite'
+os.environ.setdefault("PRINT_GATEWAY_DB", DB_FILE)
+
+from app.db import list_logs
+
+conn = sqlite3.connect(DB_FILE)
 conn.row_factory = sqlite3.Row
 c = conn.cursor()
 
@@ -19,12 +24,10 @@ for r in c.fetchall():
 
 # All logs for the last job (by correlation_id)
 print("=== LAST JOB FULL LOG TRACE ===")
-c.execute("SELECT id,level,message,context_json FROM logs ORDER BY id DESC LIMIT 40")
-rows = list(c.fetchall())
+rows = list_logs(limit=40)
 rows.reverse()
-for r in rows:
-    d = dict(r)
-    ctx_raw = d.get('context_json', '') or ''
+for d in rows:
+    ctx_raw = json.dumps(d['context'], ensure_ascii=False) if d['context'] else ''
     msg = d['message']
     if msg in ('DATECS_SEND', 'DATECS_PROTOCOL_RECV', 'JOB_SUCCESS', 'JOB_FAILED', 'JOB_PRINTING',
                'DATECS_FISCAL_JOB_START', 'DATECS_FISCAL_JOB_FAILED', 'DATECS_CLOSE_RESPONSE',
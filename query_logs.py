@@ -1,28 +1,23 @@
-import sqlite3, json, re
-conn = sqlite3.connect(r"data\print_gateway.sqlite")
+import os, json, re
+os.environ.setdefault("PRINT_GATEWAY_DB", r"data\print_gateway.sqlite")
+
+# Logs are split into per-level/per-day tables; read them through app.db.
+from app.db import list_logs
 
 # Find the latest correlation_id from PINPAD logs
-cur = conn.execute("""
-    SELECT context_json FROM logs 
-    WHERE message LIKE 'PINPAD_TXLOOP_START%'
-    ORDER BY id DESC LIMIT 1
-""")
-row = cur.fetchone()
-if row:
-    cid = json.loads(row[0]).get("correlation_id","")
+rows = list_logs(limit=1, message_prefix="PINPAD_TXLOOP_START")
+if rows:
+    cid = (rows[0]["context"] or {}).get("correlation_id","")
 else:
     cid = ""
 print(f"Latest correlation_id: {cid}\n")
 
 # Get ALL logs for this correlation_id
 def show_flow(cid):
-    cur = conn.execute("""
-        SELECT id, level, message, context_json, created_at FROM logs 
-        WHERE context_json LIKE ?
-        ORDER BY id ASC
-    """, (f"%{cid}%",))
-    for r in cur.fetchall():
-        ctx = json.loads(r[3]) if r[3] else {}
+    logs = list_logs(limit=100000, correlation_id=cid)
+    for log in reversed(logs):
+        r = (log["id"], log["level"], log["message"], log["context"], log["created_at"])
+        ctx = r[3] or {}
         msg = r[2]
         ts = r[4][11:19] if r[4] else ""
         lvl = r[1]